@@ -0,0 +1,54 @@
+"""
+abbiamo scritto questo file per misurare il tempo di importazione dei moduli della libreria
+e per controllare che importarli non carichi matplotlib e scipy, che devono essere importati
+solo quando si usano plot() o le matrici sparse.
+
+Uso: python bench_import.py [ripetizioni] [soglia_ms]
+Il programma termina con codice 1 se un modulo pesante viene caricato all'importazione o se
+il tempo mediano supera la soglia (DEFAULT: 1000 ms).
+"""
+
+import os, subprocess, sys
+
+MODULI_PESANTI = ("matplotlib", "scipy")
+
+PROGRAMMA = """
+import sys, time
+inizio = time.perf_counter()
+import graphs, functions
+fine = time.perf_counter()
+print((fine - inizio) * 1000)
+print(",".join(m for m in %r if m in sys.modules))
+""" % (MODULI_PESANTI,)
+
+
+def misura(ripetizioni):
+    """
+    Importa i moduli graphs e functions in ripetizioni processi Python nuovi.
+
+    :param ripetizioni: numero di processi da avviare
+    :return: lista dei tempi in ms, insieme dei moduli pesanti caricati
+    """
+    cartella = os.path.dirname(os.path.abspath(__file__))
+    tempi = []
+    caricati = set()
+    for i in range(ripetizioni):
+        uscita = subprocess.run([sys.executable, "-c", PROGRAMMA], cwd=cartella,
+                                capture_output=True, text=True, check=True).stdout.split("\n")
+        tempi.append(float(uscita[0]))
+        caricati.update(m for m in uscita[1].split(",") if m)
+    return tempi, caricati
+
+
+if __name__ == "__main__":
+    ripetizioni = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    soglia = float(sys.argv[2]) if len(sys.argv) > 2 else 1000.0
+    tempi, caricati = misura(ripetizioni)
+    mediana = sorted(tempi)[len(tempi) // 2]
+    print("import graphs, functions: mediana %.1f ms, minimo %.1f ms su %d processi" % (mediana, min(tempi), len(tempi)))
+    if caricati:
+        print("ERRORE: moduli pesanti caricati all'importazione: " + ", ".join(sorted(caricati)))
+        sys.exit(1)
+    if mediana > soglia:
+        print("ERRORE: tempo di importazione oltre la soglia di %.0f ms" % soglia)
+        sys.exit(1)
@@ -0,0 +1,532 @@
+"""
+Modulo contenente la classe FrozenGraph, un'istantanea immutabile di un grafo orientato
+memorizzata in forma CSR (compressed sparse row) tramite array NumPy.
+L'istantanea si ottiene con DirectedGraph.freeze() ed e' pensata per gli algoritmi in sola
+lettura (cammini minimi, gradi, visite), che su di essa non devono attraversare oggetti
+DirGraphNode e dizionari di etichette.
+"""
+
+
+from heapq import heappush, heappop
+from math import inf
+import multiprocessing
+import os
+import numpy as np
+import traversal
+
+
+ARRAYS = ("ids", "indptr_out", "indices_out", "weights_out", "indptr_in", "indices_in", "weights_in")
+
+# istantanea usata dai processi di batch_shortest_paths, ereditata con fork o
+# ricostruita dalla memoria condivisa in _inizializza_processo
+_CONDIVISO = None
+
+
+def _csr_da_coo(righe, colonne, pesi, n):
+    """
+    Converte gli archi in formato COO (righe, colonne, pesi) nei tre array CSR indptr, indices, weights.
+    All'interno di ogni riga le colonne risultano ordinate.
+
+    :param righe: array degli indici compatti dei nodi di partenza
+    :param colonne: array degli indici compatti dei nodi di arrivo
+    :param pesi: array dei pesi degli archi
+    :param n: numero di nodi
+    :return: indptr, indices, weights
+    """
+    ordine = np.lexsort((colonne, righe))
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(righe, minlength=n), out=indptr[1:])
+    return indptr, colonne[ordine].astype(np.int64), pesi[ordine].astype(float)
+
+
+def _inizializza_processo(descrizioni, name):
+    """
+    Inizializzatore dei processi avviati senza fork: ricostruisce l'istantanea con array che
+    puntano ai blocchi di memoria condivisa creati dal processo principale, senza copiarli.
+
+    :param descrizioni: lista di tuple (nome del blocco, forma, dtype) nell'ordine di ARRAYS
+    :param name: nome del grafo
+    :return:
+    """
+    from multiprocessing import shared_memory
+    global _CONDIVISO
+    blocchi = [shared_memory.SharedMemory(name=nome) for nome, forma, tipo in descrizioni]
+    array = [np.ndarray(forma, dtype=tipo, buffer=blocco.buf)
+             for blocco, (nome, forma, tipo) in zip(blocchi, descrizioni)]
+    _CONDIVISO = FrozenGraph(*array, name=name)
+    _CONDIVISO._blocchi = blocchi
+
+
+def _risolvi_gruppo(gruppo):
+    """
+    Eseguita nei processi di batch_shortest_paths: risolve sull'istantanea condivisa tutte le
+    richieste con la stessa partenza.
+
+    :param gruppo: tupla (indice compatto di partenza, lista degli indici compatti di arrivo)
+    :return: lista di (parenti, lista_pesi) nell'ordine degli arrivi
+    """
+    return _CONDIVISO._cammini_da(*gruppo)
+
+
+class FrozenGraph:
+    """
+    La classe FrozenGraph rappresenta un'istantanea immutabile di un grafo orientato.
+
+    Al suo interno sono presenti i seguenti attributi:
+    - name -> stringa: nome del grafo da cui e' stata ottenuta l'istantanea
+    - ids -> array ordinato degli ID dei nodi: la posizione di un ID e' il suo indice compatto
+    - indptr_out, indices_out, weights_out -> array CSR dei lati uscenti: i vicini in uscita del nodo
+      di indice i sono indices_out[indptr_out[i]:indptr_out[i+1]], con i pesi corrispondenti in weights_out
+    - indptr_in, indices_in, weights_in -> array CSR dei lati entranti, con lo stesso schema
+
+    Gli array non sono modificabili; i metodi accettano e restituiscono ID di nodi, come DirectedGraph.
+    """
+    def __init__(self, ids, indptr_out, indices_out, weights_out,
+                 indptr_in, indices_in, weights_in, name='noname_graph'):
+        """
+        Questo metodo serve per l'inizializzazione di un elemento di tipo FrozenGraph a partire
+        dagli array CSR gia' costruiti (vedi from_arrays per costruirli dagli archi).
+
+        :return:
+        """
+        self.name = name
+        self.ids = ids
+        self.indptr_out = indptr_out
+        self.indices_out = indices_out
+        self.weights_out = weights_out
+        self.indptr_in = indptr_in
+        self.indices_in = indices_in
+        self.weights_in = weights_in
+        for array in (ids, indptr_out, indices_out, weights_out, indptr_in, indices_in, weights_in):
+            if array.flags.writeable:
+                array.setflags(write=False)
+
+    @classmethod
+    def from_arrays(cls, ids, righe, colonne, pesi, name='noname_graph'):
+        """
+        Costruisce l'istantanea a partire dagli ID ordinati dei nodi e dagli archi in formato COO
+        espressi con indici compatti, come restituiti da DirectedGraph.adjacency_arrays(compatta=True).
+
+        :param ids: array ordinato degli ID dei nodi
+        :param righe: array degli indici compatti dei nodi di partenza
+        :param colonne: array degli indici compatti dei nodi di arrivo
+        :param pesi: array dei pesi degli archi
+        :param name: nome del grafo. DEFAULT: 'noname_graph'
+        :return: FrozenGraph
+        """
+        n = len(ids)
+        indptr_out, indices_out, weights_out = _csr_da_coo(righe, colonne, pesi, n)
+        indptr_in, indices_in, weights_in = _csr_da_coo(colonne, righe, pesi, n)
+        return cls(np.asarray(ids, dtype=np.int64), indptr_out, indices_out, weights_out,
+                   indptr_in, indices_in, weights_in, name)
+
+    def save_arrays(self, percorso):
+        """
+        Salva nella cartella data un file .npy per ciascuno degli array elencati in ARRAYS.
+
+        :param percorso: il percorso di una cartella esistente
+        :return:
+        """
+        for nome in ARRAYS:
+            np.save(os.path.join(percorso, nome + ".npy"), getattr(self, nome))
+
+    @classmethod
+    def load_arrays(cls, percorso, name='noname_graph', mmap_mode=None):
+        """
+        Costruisce l'istantanea leggendo gli array salvati con save_arrays.
+
+        :param percorso: il percorso della cartella contenente i file .npy
+        :param name: nome del grafo. DEFAULT: 'noname_graph'
+        :param mmap_mode: modalita' passata a np.load. DEFAULT: None (array caricati in memoria)
+        :return: FrozenGraph
+        """
+        array = [np.load(os.path.join(percorso, nome + ".npy"), mmap_mode=mmap_mode) for nome in ARRAYS]
+        return cls(*array, name=name)
+
+    @staticmethod
+    def is_saved_in(percorso):
+        """
+        Indica se la cartella data contiene gli array salvati con save_arrays.
+
+        :param percorso: il percorso della cartella
+        :return: bool
+        """
+        return all(os.path.exists(os.path.join(percorso, nome + ".npy")) for nome in ARRAYS)
+
+    def index_of(self, idn):
+        """
+        Restituisce l'indice compatto del nodo con ID idn, oppure -1 se il nodo non esiste.
+
+        :param idn: ID del nodo
+        :return: int
+        """
+        i = int(np.searchsorted(self.ids, idn))
+        if i < len(self.ids) and self.ids[i] == idn:
+            return i
+        return -1
+
+    def size(self):
+        """
+        Questo metdo restituisce il numero di nodi e il numero di archi dell'istantanea.
+
+        :return: numero di nodi, numero di archi
+        """
+        return len(self.ids), len(self.indices_out)
+
+    def degrees(self, idn):
+        """
+        Restituisce il numero di lati in uscita (degout) e in entrata (degin) del nodo con ID idn.
+
+        :param idn: ID del nodo
+        :return: degout, degin
+
+        Se viene fornito un id inesistente si riceve un messaggio
+        di errore "input invalidi" e il metodo restituisce None,None
+        """
+        i = self.index_of(idn)
+        if i == -1:
+            print("input invalidi")
+            return None, None
+        degout = int(self.indptr_out[i + 1] - self.indptr_out[i])
+        degin = int(self.indptr_in[i + 1] - self.indptr_in[i])
+        return degout, degin
+
+    def out_degrees(self):
+        """
+        :return: array dei gradi in uscita di tutti i nodi, nell'ordine di ids
+        """
+        return np.diff(self.indptr_out)
+
+    def in_degrees(self):
+        """
+        :return: array dei gradi in entrata di tutti i nodi, nell'ordine di ids
+        """
+        return np.diff(self.indptr_in)
+
+    def neighbours_out(self, idn):
+        """
+        Restituisce gli ID dei vicini in uscita del nodo con ID idn e i pesi dei relativi lati.
+
+        :param idn: ID del nodo
+        :return: array di ID, array di pesi
+
+        Se viene fornito un id inesistente si riceve un messaggio
+        di errore "input invalidi" e il metodo restituisce None,None
+        """
+        i = self.index_of(idn)
+        if i == -1:
+            print("input invalidi")
+            return None, None
+        a, b = self.indptr_out[i], self.indptr_out[i + 1]
+        return self.ids[self.indices_out[a:b]], self.weights_out[a:b]
+
+    def neighbours_in(self, idn):
+        """
+        Restituisce gli ID dei vicini in entrata del nodo con ID idn e i pesi dei relativi lati.
+
+        :param idn: ID del nodo
+        :return: array di ID, array di pesi
+
+        Se viene fornito un id inesistente si riceve un messaggio
+        di errore "input invalidi" e il metodo restituisce None,None
+        """
+        i = self.index_of(idn)
+        if i == -1:
+            print("input invalidi")
+            return None, None
+        a, b = self.indptr_in[i], self.indptr_in[i + 1]
+        return self.ids[self.indices_in[a:b]], self.weights_in[a:b]
+
+    def _peso(self, i, j):
+        """
+        Restituisce il peso del lato tra gli indici compatti i e j con una ricerca binaria nella riga i.
+        """
+        a, b = int(self.indptr_out[i]), int(self.indptr_out[i + 1])
+        k = a + int(np.searchsorted(self.indices_out[a:b], j))
+        return float(self.weights_out[k])
+
+    def _dijkstra(self, sorgente, destinazione=-1, destinazioni=None):
+        """
+        Algoritmo di Dijkstra su coda di priorita' che lavora sugli indici compatti.
+
+        :param sorgente: indice compatto del nodo di partenza
+        :param destinazione: (facoltativo) indice compatto al quale fermare la visita
+        :param destinazioni: (facoltativo) insieme di indici compatti: la visita si ferma quando
+                             sono stati processati tutti
+        :return: distanze, parents: dizionari indice:costo e indice:predecessore dei nodi processati
+        """
+        indptr, indices, weights = self.indptr_out, self.indices_out, self.weights_out
+        costo_nodi = {sorgente: 0.0}
+        parents = {sorgente: -1}
+        distanze = {}
+        coda = [(0.0, sorgente)]
+        mancanti = len(destinazioni) if destinazioni is not None else -1
+
+        while coda:
+            costo, v = heappop(coda)
+            if v in distanze:
+                continue
+            distanze[v] = costo
+            if v == destinazione:
+                break
+            if mancanti > 0 and v in destinazioni:
+                mancanti = mancanti - 1
+                if mancanti == 0:
+                    break
+            a, b = int(indptr[v]), int(indptr[v + 1])
+            for u, peso in zip(indices[a:b].tolist(), weights[a:b].tolist()):
+                temp = costo + peso
+                if u not in distanze and temp < costo_nodi.get(u, inf):
+                    costo_nodi[u] = temp
+                    parents[u] = v
+                    heappush(coda, (temp, u))
+        return distanze, parents
+
+    def _cammino(self, parents, j):
+        """
+        Ricostruisce il cammino che termina nell'indice j risalendo i predecessori; la partenza
+        ha come predecessore -1 oppure se stessa.
+
+        :return: (parenti, lista_pesi) espressi con ID dei nodi
+        """
+        indici = [j]
+        padre = int(parents[j])
+        while padre != -1 and padre != indici[-1]:
+            indici.append(padre)
+            padre = int(parents[padre])
+        indici.reverse()
+        lista_pesi = [self._peso(indici[k], indici[k + 1]) for k in range(len(indici) - 1)]
+        return tuple(self.ids[indici].tolist()), tuple(lista_pesi)
+
+    def minpath_dijkstra(self, id_start, id_end):
+        """
+        Equivalente di DirectedGraph.minpath_dijkstra sull'istantanea.
+
+        :param id_start: id del nodo di partenza
+        :param id_end: id del nodo di arrivo
+        :return: (parenti, lista_pesi)
+
+        Se vengono forniti id inesistenti si riceve un messaggio
+        di errore "input invalidi" e il metodo restituisce None,None
+
+        Se il cammino desiderato non esiste si riceve un messaggio di errore
+        "I nodi indicati non sono collegabili tra di loro" e il metodo restituisce None, None
+        """
+        i, j = self.index_of(id_start), self.index_of(id_end)
+        if i == -1 or j == -1:
+            print("input invalidi")
+            return None, None
+        distanze, parents = self._dijkstra(i, j)
+        if j not in distanze:
+            print("I nodi indicati non sono collegabili tra di loro")
+            return None, None
+        return self._cammino(parents, j)
+
+    def _cammini_da(self, sorgente, destinazioni):
+        """
+        Calcola con una sola visita, fermata appena raggiunti tutti gli arrivi, i cammini minimi
+        dall'indice compatto sorgente verso ciascuno degli indici in destinazioni.
+
+        :return: lista di (parenti, lista_pesi), con (None, None) per gli arrivi non raggiungibili
+        """
+        if len(destinazioni) == 1:
+            distanze, parents = self._dijkstra(sorgente, destinazioni[0])
+        else:
+            distanze, parents = self._dijkstra(sorgente, destinazioni=set(destinazioni))
+        return [self._cammino(parents, j) if j in distanze else (None, None) for j in destinazioni]
+
+    def batch_shortest_paths(self, coppie, workers=None):
+        """
+        Calcola i cammini minimi per un elenco di coppie (id_start, id_end) distribuendo il lavoro
+        su piu' processi. Le richieste vengono raggruppate per nodo di partenza, cosi' che ogni
+        partenza richieda una sola visita, e i gruppi vengono divisi tra i processi.
+        I processi condividono gli array dell'istantanea senza copiarli: dove disponibile vengono
+        avviati con fork ed ereditano la memoria del processo principale, altrimenti gli array
+        vengono posti in blocchi di memoria condivisa (multiprocessing.shared_memory).
+
+        :param coppie: lista di tuple (id_start, id_end) oppure array di forma (k, 2)
+        :param workers: numero di processi; None = numero di CPU, 1 = nessun processo aggiuntivo.
+                        DEFAULT: None
+        :return: lista di (parenti, lista_pesi) nello stesso ordine di coppie; per gli ID
+                 inesistenti o i nodi non collegabili l'elemento e' (None, None)
+        """
+        coppie = np.asarray(coppie, dtype=np.int64).reshape(-1, 2)
+        risultati = [(None, None)] * len(coppie)
+        n = len(self.ids)
+        if n == 0 or len(coppie) == 0:
+            return risultati
+        indici = np.minimum(np.searchsorted(self.ids, coppie), n - 1)
+        validi = np.flatnonzero((self.ids[indici] == coppie).all(axis=1))
+        ordine = validi[np.argsort(indici[validi, 0], kind="stable")]
+        partenze = indici[ordine, 0]
+        inizi = np.flatnonzero(np.r_[True, partenze[1:] != partenze[:-1]]).tolist()
+        fini = inizi[1:] + [len(ordine)]
+        arrivi = indici[ordine, 1].tolist()
+        gruppi = [(int(partenze[a]), arrivi[a:b]) for a, b in zip(inizi, fini)]
+
+        if workers is None:
+            workers = os.cpu_count() or 1
+        workers = min(workers, len(gruppi))
+        if workers <= 1:
+            cammini = [self._cammini_da(*gruppo) for gruppo in gruppi]
+        else:
+            cammini = self._in_parallelo(gruppi, workers)
+
+        posizioni = ordine.tolist()
+        k = 0
+        for gruppo in cammini:
+            for cammino in gruppo:
+                risultati[posizioni[k]] = cammino
+                k = k + 1
+        return risultati
+
+    def _in_parallelo(self, gruppi, workers):
+        """
+        Esegue _risolvi_gruppo su tutti i gruppi con un pool di processi che condividono l'istantanea.
+
+        :return: lista dei risultati di ciascun gruppo, nell'ordine di gruppi
+        """
+        global _CONDIVISO
+        blocco = max(1, len(gruppi) // (workers * 4))
+        if "fork" in multiprocessing.get_all_start_methods():
+            _CONDIVISO = self
+            try:
+                with multiprocessing.get_context("fork").Pool(workers) as pool:
+                    return pool.map(_risolvi_gruppo, gruppi, blocco)
+            finally:
+                _CONDIVISO = None
+
+        from multiprocessing import shared_memory
+        blocchi = []
+        try:
+            descrizioni = []
+            for nome in ARRAYS:
+                array = getattr(self, nome)
+                memoria = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+                blocchi.append(memoria)
+                np.ndarray(array.shape, dtype=array.dtype, buffer=memoria.buf)[...] = array
+                descrizioni.append((memoria.name, array.shape, array.dtype.str))
+            with multiprocessing.get_context("spawn").Pool(workers, _inizializza_processo,
+                                                           (descrizioni, self.name)) as pool:
+                return pool.map(_risolvi_gruppo, gruppi, blocco)
+        finally:
+            for memoria in blocchi:
+                memoria.close()
+                memoria.unlink()
+
+    def all_pairs_shortest_paths(self, metodo="auto", file=None):
+        """
+        Calcola la matrice delle distanze minime tra tutte le coppie di nodi; la riga i e la
+        colonna j corrispondono ai nodi ids[i] e ids[j], le coppie non collegabili valgono inf.
+
+        Con metodo "floyd" si usa l'algoritmo di Floyd-Warshall vettorizzato: n passi, ognuno dei
+        quali aggiorna la matrice a blocchi di righe con due operazioni numpy, in un'area di lavoro
+        di al piu' 32 MB, cosi' che con file la matrice non debba stare per intero in memoria. Con
+        metodo "dijkstra" si esegue una visita con coda di priorita' da ogni nodo, conveniente sui
+        grafi sparsi. Con "auto" la
+        scelta dipende dalla densita': secondo i tempi misurati un passo di Floyd-Warshall costa
+        circa n*n operazioni numpy da 2.5 ns, una visita circa 2.5 us per nodo e 0.12 us per lato;
+        Floyd-Warshall viene scelto anche se ci sono pesi negativi, che Dijkstra non gestisce.
+
+        :param metodo: "auto", "floyd" o "dijkstra". DEFAULT: "auto"
+        :param file: (facoltativo) percorso di un file .npy in cui scrivere la matrice, che viene
+                     restituita come array mappato in memoria (np.memmap). DEFAULT: None
+        :return: distanze: array (n, n)
+
+        Se viene fornito un metodo inesistente si riceve un messaggio
+        di errore "input invalidi" e il metodo restituisce None
+        """
+        n = len(self.ids)
+        m = len(self.indices_out)
+        if metodo == "auto":
+            if n * n < 1000 * n + 50 * m or (m and self.weights_out.min() < 0):
+                metodo = "floyd"
+            else:
+                metodo = "dijkstra"
+        if metodo not in ("floyd", "dijkstra"):
+            print("input invalidi")
+            return None
+
+        if file is not None:
+            distanze = np.lib.format.open_memmap(file, mode="w+", dtype=float, shape=(n, n))
+        else:
+            distanze = np.empty((n, n))
+        distanze.fill(inf)
+
+        if metodo == "floyd":
+            righe = np.repeat(np.arange(n), self.out_degrees())
+            distanze[righe, self.indices_out] = self.weights_out
+            diagonale = np.arange(n)
+            distanze[diagonale, diagonale] = np.minimum(distanze[diagonale, diagonale], 0.0)
+            blocco = max(1, min(n, (1 << 22) // max(n, 1)))
+            passo = np.empty((blocco, n))
+            for k in range(n):
+                riga_k = np.array(distanze[k])
+                for inizio in range(0, n, blocco):
+                    fine = min(inizio + blocco, n)
+                    righe_blocco = distanze[inizio:fine]
+                    np.add(righe_blocco[:, k, None], riga_k[None, :], out=passo[:fine - inizio])
+                    np.minimum(righe_blocco, passo[:fine - inizio], out=righe_blocco)
+        else:
+            for i in range(n):
+                distanze_dict, _ = self._dijkstra(i)
+                riga = distanze[i]
+                riga[np.fromiter(distanze_dict.keys(), dtype=np.int64, count=len(distanze_dict))] = \
+                    np.fromiter(distanze_dict.values(), dtype=float, count=len(distanze_dict))
+
+        if file is not None:
+            distanze.flush()
+        return distanze
+
+    def shortest_path_tree(self, id_start):
+        """
+        Calcola con una sola visita l'albero dei cammini minimi dal nodo id_start.
+
+        :param id_start: id del nodo di partenza
+        :return: (distanze, predecessori): array indicizzati per indice compatto; i nodi non
+                 raggiungibili hanno distanza inf e predecessore -1, il nodo di partenza ha
+                 come predecessore se stesso
+
+        Se viene fornito un id inesistente si riceve un messaggio
+        di errore "input invalidi" e il metodo restituisce None,None
+        """
+        i = self.index_of(id_start)
+        if i == -1:
+            print("input invalidi")
+            return None, None
+        distanze_dict, parents = self._dijkstra(i)
+        distanze = np.full(len(self.ids), inf)
+        predecessori = np.full(len(self.ids), -1, dtype=np.int64)
+        if distanze_dict:
+            chiavi = np.fromiter(distanze_dict.keys(), dtype=np.int64, count=len(distanze_dict))
+            distanze[chiavi] = np.fromiter(distanze_dict.values(), dtype=float, count=len(distanze_dict))
+            predecessori[chiavi] = [parents[k] for k in distanze_dict]
+            predecessori[i] = i
+        return distanze, predecessori
+
+    def path_from_tree(self, predecessori, id_end):
+        """
+        Dato l'array dei predecessori restituito da shortest_path_tree, restituisce il cammino
+        minimo verso id_end nello stesso formato di minpath_dijkstra.
+
+        :param predecessori: array dei predecessori per indice compatto
+        :param id_end: id del nodo di arrivo
+        :return: (parenti, lista_pesi), oppure None,None se id_end non e' raggiungibile
+        """
+        j = self.index_of(id_end)
+        if j == -1 or predecessori[j] == -1:
+            return None, None
+        return self._cammino(predecessori, j)
+
+    def bfs(self, id_start):
+        """
+        Visita in ampiezza a partire dal nodo id_start lungo i lati uscenti; equivale a
+        traversal.bfs(istantanea, id_start).
+
+        :param id_start: id del nodo di partenza
+        :return: generatore degli ID dei nodi nell'ordine di visita
+
+        Se viene fornito un id inesistente si riceve un messaggio
+        di errore "input invalidi" e il generatore non produce alcun nodo
+        """
+        return traversal.bfs(self, id_start)
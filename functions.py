@@ -1,29 +1,48 @@
 """
 Qui è contenuta la funzione load che permette di creare un grafo
-da file presenti in una cartella
+da file presenti in una cartella, eventualmente in sola lettura
+mappando in memoria i file che ne contengono la struttura
 """
-from graphs import *
+from graphs import DirectedGraph, _cartella_base
+from frozen import FrozenGraph
 
-import os, shutil
-from pickle import *
-from scipy import *
+import os
+from pickle import load
 
 
-def load_graph(percorso):
+def load_graph(percorso, sola_lettura=False):
     """
-    Questa funzione , ricevuto il percorso file di una cartella contenente dei file adjacency.npz, id list.pkl,
-    attributes.pkl, edge labels.pkl, crea un grafo G come oggetto della classe
-    DirectedGraph e caratterizzato dai file sopra indicati.
+    Questa funzione , ricevuto il percorso file di una cartella creata con DirectedGraph.save
+    (nel formato "npy", con gli array CSR in file .npy, oppure nel formato "pkl", con i file
+    adjacency.pkl e id_list.pkl) e contenente i file attributes.pkl e edge_labels.pkl,
+    crea un grafo G come oggetto della classe DirectedGraph e caratterizzato dai file sopra indicati.
+    I nodi mantengono gli ID salvati.
+
+    Con sola_lettura=True la funzione restituisce invece un FrozenGraph i cui array CSR sono
+    mappati in memoria (np.memmap) direttamente dai file .npy: l'apertura e' quasi istantanea,
+    le pagine vengono lette dal disco solo quando un'interrogazione le usa e piu' processi che
+    aprono la stessa cartella condividono un'unica copia nella cache del sistema operativo.
+    Le etichette non vengono caricate. Una cartella in formato "pkl", o che contiene modifiche
+    non ancora incorporate con compact(), viene caricata per intero e poi convertita con freeze().
+
+    Dopo il caricamento vengono ripetute le operazioni registrate nel file "delta.log" della
+    cartella (vedi DirectedGraph.checkpoint) e il grafo resta associato alla cartella.
 
     :param percorso: percorso file della cartella contenente i file per costruire il grafo
+    :param sola_lettura: se True restituisce un FrozenGraph mappato in memoria. DEFAULT: False
     :return: grafo
     """
-    cartella_programma=os.getcwd()
-    os.chdir(percorso)
-    file_attributi=open("attributes.pkl","rb")
-    attributi=load(file_attributi,allow_pickle=True)
-    file_attributi.close()
-    os.chdir(cartella_programma)
+    base = _cartella_base(percorso)
+    with open(os.path.join(base, "attributes.pkl"),"rb") as file_attributi:
+        attributi=load(file_attributi)
+    if (sola_lettura and FrozenGraph.is_saved_in(base)
+            and not os.path.exists(os.path.join(base, "delta.log"))):
+        return FrozenGraph.load_arrays(base, attributi["name"], mmap_mode="r")
     grafo=DirectedGraph(attributi["name"],attributi["default_weight"])
-    grafo.add_from_files(percorso)
+    grafo.add_from_files(base)
+    grafo._riapplica_registro(base)
+    grafo._cartella = percorso
+    grafo._registro = []
+    if sola_lettura:
+        return grafo.freeze()
     return grafo
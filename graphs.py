@@ -7,17 +7,95 @@ di nodi e archi, consente di salvare e/o caricare i dati del grafo su file .pkl
 e contiene un metodo basato sull'algoritmo di Dijikstra per il
 calcolo del cammino minimo tra due nodi. E' inoltre implementato
 un metodo che consente la visualizzazione grafica dell'oggetto costruito.
+
+Il modulo dipende solo da numpy: scipy e matplotlib vengono importati solo dai metodi
+che li usano (matrici sparse in compute_adjacency e salvataggio "pkl", plot), cosi'
+che l'importazione del modulo resti rapida (vedi bench_import.py).
 """
 
 
-from pickle import *
+from pickle import dump, load
 import os, shutil
-from scipy.sparse import *
-from scipy import *
 import numpy as np
-from copy import deepcopy
-import matplotlib.pyplot as plt
-import matplotlib.cbook as cbook
+import csv, json
+from heapq import heappush, heappop
+from itertools import chain
+from math import inf
+from numbers import Integral
+from frozen import FrozenGraph, ARRAYS
+from label_index import LabelIndex
+
+
+_ASSENTE = object()
+
+
+def _soddisfa(leggi, predicati):
+    """
+    Indica se le etichette lette con leggi(chiave, mancante) soddisfano tutti i predicati,
+    ognuno dei quali e' un valore da confrontare per uguaglianza o una funzione booleana.
+    """
+    for chiave, predicato in predicati.items():
+        valore = leggi(chiave, _ASSENTE)
+        if valore is _ASSENTE:
+            return False
+        if callable(predicato):
+            if not predicato(valore):
+                return False
+        elif valore != predicato:
+            return False
+    return True
+
+
+def _nell_intervallo(valore, minimo, massimo):
+    """
+    Indica se valore e' compreso tra minimo e massimo (estremi inclusi, None = nessun limite);
+    i valori non confrontabili con gli estremi non lo sono.
+    """
+    try:
+        return (minimo is None or valore >= minimo) and (massimo is None or valore <= massimo)
+    except TypeError:
+        return False
+
+
+def _candidati(indici, predicati):
+    """
+    Se uno dei predicati di uguaglianza riguarda un'etichetta indicizzata, restituisce gli elementi
+    che lo soddisfano letti dall'indice; altrimenti None.
+    """
+    for chiave, predicato in predicati.items():
+        if chiave in indici and not callable(predicato):
+            try:
+                return indici[chiave].uguale(predicato)
+            except TypeError:
+                pass
+    return None
+
+
+def _colonna(valori):
+    """
+    Converte una lista di valori in un array numpy di float, oppure di oggetti se i valori
+    non sono tutti numerici.
+    """
+    try:
+        return np.array(valori, dtype=float)
+    except (TypeError, ValueError):
+        return np.array(valori, dtype=object)
+
+
+def _cartella_base(percorso):
+    """
+    Restituisce la cartella che contiene i file di base e il file "delta.log" di un grafo salvato.
+    Dopo il primo compact() e' la sottocartella indicata nel file "CURRENT", altrimenti e' la
+    cartella stessa.
+
+    :param percorso: il percorso della cartella creata con save
+    :return: percorso della cartella di base
+    """
+    puntatore = os.path.join(percorso, "CURRENT")
+    if not os.path.exists(puntatore):
+        return percorso
+    with open(puntatore) as file_puntatore:
+        return os.path.join(percorso, file_puntatore.read().strip())
 
 
 class DirGraphNode:
@@ -32,8 +110,24 @@ class DirGraphNode:
     - neighbours_in -> lista: contiene oggetti DirGraphNode wi tali che wi sia l'i-esimo vicino di v
       considerando i lati (wi,v), ovvero entranti in v
 
+    Per contenere la memoria occupata il nodo usa __slots__ e memorizza i lati in forma compatta:
+    - _out -> dizionario id ui : peso del lato (v,ui)
+    - _extra -> None, oppure dizionario id ui : etichette del lato (v,ui) diverse dal peso; viene
+      creato solo per i lati che hanno etichette oltre a "weight"
+    - _in -> insieme degli id wi dei lati (wi,v)
+    - _nodi -> dizionario id:nodo usato per risolvere gli id nelle viste (quello del grafo di appartenenza)
+    - _esterni -> None, oppure dizionario id:nodo dei vicini collegati con add_neighbours_out o
+      add_neighbours_in che non compaiono in _nodi; e' proprio del nodo, quindi il grafo non ne
+      viene modificato
+    - _condiviso -> bool: True se _out, _extra e _in sono condivisi con il nodo corrispondente di una
+      copia del grafo (vedi DirectedGraph.copy); vengono duplicati alla prima modifica
+    labels e' creato solo al primo accesso. neighbours_out e neighbours_in sono viste ricostruite
+    ad ogni lettura: inserimento, ricerca e rimozione di un vicino avvengono in tempo costante.
+
     I metodi contenuti sono utili per la gestione dei nodi.
     """
+    __slots__ = ("id", "_labels", "_out", "_extra", "_in", "_nodi", "_esterni", "_condiviso")
+
     def __init__(self, id=None, **labels):
         """
         Questo metodo serve per l'inizializzazione di un elemento di tipo DirGraphNode.
@@ -44,9 +138,179 @@ class DirGraphNode:
         :return:
         """
         self.id = id
-        self.labels = labels
-        self.neighbours_out = []
-        self.neighbours_in = []
+        self._labels = labels if labels else None
+        self._out = {}
+        self._extra = None
+        self._in = set()
+        self._nodi = None
+        self._esterni = None
+        self._condiviso = False
+
+    @property
+    def labels(self):
+        """
+        Dizionario delle etichette del nodo, creato al primo accesso.
+        """
+        if self._labels is None:
+            self._labels = {}
+        return self._labels
+
+    @labels.setter
+    def labels(self, labels):
+        self._labels = labels
+
+    @property
+    def neighbours_out(self):
+        """
+        Vista in forma di lista di tuple (nodo, etichette) dei vicini in uscita.
+        """
+        return [(self._vicino(idn), self._etichette(idn)) for idn in self._out]
+
+    @property
+    def neighbours_in(self):
+        """
+        Vista in forma di lista dei vicini in entrata.
+        """
+        return [self._vicino(idn) for idn in self._in]
+
+    def _vicino(self, idn):
+        """
+        Restituisce il nodo con ID idn, cercandolo prima tra i nodi del grafo e poi tra i vicini
+        esterni.
+        """
+        if self._nodi is not None and idn in self._nodi:
+            return self._nodi[idn]
+        return self._esterni[idn]
+
+    def _etichette(self, idn):
+        """
+        Ricostruisce il dizionario delle etichette del lato (v,u), dove u e' il nodo con ID idn,
+        unendo le eventuali etichette in _extra al peso in _out.
+
+        :param idn: ID del nodo u
+        :return: dizionario
+        """
+        etichette = {}
+        if self._extra is not None and idn in self._extra:
+            etichette.update(self._extra[idn])
+        if self._out[idn] is not None:
+            etichette["weight"] = self._out[idn]
+        return etichette
+
+    def _etichetta(self, idn, chiave, mancante=None):
+        """
+        Restituisce il valore di una sola etichetta del lato (v,u), dove u e' il nodo con ID idn,
+        senza ricostruire il dizionario completo.
+
+        :param idn: ID del nodo u
+        :param chiave: nome dell'etichetta
+        :param mancante: valore restituito se il lato o l'etichetta non esistono. DEFAULT: None
+        :return: valore dell'etichetta
+        """
+        if chiave == "weight":
+            peso = self._out.get(idn)
+            return mancante if peso is None else peso
+        if self._extra is None or idn not in self._extra:
+            return mancante
+        return self._extra[idn].get(chiave, mancante)
+
+    def _copia_condivisa(self, nodi):
+        """
+        Restituisce un nuovo nodo con lo stesso ID e le stesse etichette che condivide con quello
+        corrente i dizionari dei vicini; entrambi i nodi li duplicheranno alla prima modifica.
+
+        :param nodi: dizionario id:nodo del grafo a cui appartiene la copia
+        :return: DirGraphNode
+        """
+        copia = DirGraphNode.__new__(DirGraphNode)
+        copia.id = self.id
+        copia._labels = dict(self._labels) if self._labels else None
+        copia._out = self._out
+        copia._extra = self._extra
+        copia._in = self._in
+        copia._nodi = nodi
+        copia._esterni = dict(self._esterni) if self._esterni else None
+        copia._condiviso = True
+        self._condiviso = True
+        return copia
+
+    def _separa(self):
+        """
+        Se i dizionari dei vicini sono condivisi con una copia, li sostituisce con copie private.
+        Va chiamato prima di ogni modifica di _out, _extra o _in.
+        """
+        if self._condiviso:
+            self._out = dict(self._out)
+            self._in = set(self._in)
+            if self._extra is not None:
+                self._extra = {idn: dict(extra) for idn, extra in self._extra.items()}
+            self._condiviso = False
+
+    def _add_in(self, idn):
+        """
+        Registra il lato (w,v), dove w e' il nodo con ID idn.
+        """
+        self._separa()
+        self._in.add(idn)
+
+    def _del_in(self, idn):
+        """
+        Rimuove, se esiste, il lato (w,v), dove w e' il nodo con ID idn.
+        """
+        if idn in self._in:
+            self._separa()
+            self._in.discard(idn)
+
+    def _set_out(self, idn, edge_labels):
+        """
+        Crea il lato (v,u), dove u e' il nodo con ID idn, o ne aggiorna le etichette.
+
+        :param idn: ID del nodo u
+        :param edge_labels: etichette del lato; il peso e' atteso nella chiave "weight"
+        :return: True se il lato e' nuovo, False altrimenti
+        """
+        self._separa()
+        nuovo = idn not in self._out
+        if nuovo or "weight" in edge_labels:
+            self._out[idn] = edge_labels.get("weight")
+        if len(edge_labels) > ("weight" in edge_labels):
+            if self._extra is None:
+                self._extra = {}
+            extra = self._extra.get(idn)
+            if extra is None:
+                extra = self._extra[idn] = {}
+            for chiave, valore in edge_labels.items():
+                if chiave != "weight":
+                    extra[chiave] = valore
+        return nuovo
+
+    def _del_out(self, idn):
+        """
+        Rimuove, se esiste, il lato (v,u) dove u e' il nodo con ID idn.
+
+        :param idn: ID del nodo u
+        :return: True se il lato esisteva, False altrimenti
+        """
+        if idn not in self._out:
+            return False
+        self._separa()
+        del self._out[idn]
+        if self._extra is not None:
+            self._extra.pop(idn, None)
+            if not self._extra:
+                self._extra = None
+        return True
+
+    def _registra(self, nodo):
+        """
+        Rende risolvibile nelle viste l'ID di un nodo collegato a quello corrente. Un nodo che non
+        compare nel dizionario _nodi viene conservato in _esterni, senza modificare _nodi.
+        """
+        if self._nodi is not None and nodo.id in self._nodi:
+            return
+        if self._esterni is None:
+            self._esterni = {}
+        self._esterni.setdefault(nodo.id, nodo)
 
     def get_neighbours(self):
         """
@@ -54,10 +318,7 @@ class DirGraphNode:
 
         :return: neighbours_out, self.neighbours_in
         """
-        neighbours_out = []
-        for pair in self.neighbours_out:
-            neighbours_out.append(pair[0])
-
+        neighbours_out = [self._vicino(idn) for idn in self._out]
         return neighbours_out, self.neighbours_in
 
 
@@ -67,11 +328,31 @@ class DirGraphNode:
 
         :return: degout, degin
         """
-        degout=len(self.neighbours_out)
-        degin=len(self.neighbours_in)
+        degout=len(self._out)
+        degin=len(self._in)
         return degout, degin
 
 
+    def has_neighbour_out(self, idn):
+        """
+        Il metodo indica, in tempo costante, se esiste il lato (v,u) dove u e' il nodo con ID idn
+
+        :param idn: ID del nodo u
+        :return: bool
+        """
+        return idn in self._out
+
+
+    def has_neighbour_in(self, idn):
+        """
+        Il metodo indica, in tempo costante, se esiste il lato (w,v) dove w e' il nodo con ID idn
+
+        :param idn: ID del nodo w
+        :return: bool
+        """
+        return idn in self._in
+
+
     def get_edge_labels(self, elenco):
         """
         Dato un elenco di nodi (u0,...,un), il metodo restituisce una lista contenente le etichette dei lati (v,ui)
@@ -81,10 +362,8 @@ class DirGraphNode:
         """
         lista=[]
         for nodo in elenco:
-            if nodo in self.get_neighbours()[0]:
-                for pair in self.neighbours_out:
-                    if pair[0]==nodo:
-                        lista.append(pair[1])
+            if nodo.id in self._out:
+                lista.append(self._etichette(nodo.id))
         return lista
 
     
@@ -92,20 +371,18 @@ class DirGraphNode:
     def add_neighbours_out(self, *new_neighbours_out, **edge_labels):
         """
         Il metodo aggiunge nuove tuple (nodo, labels) all'attributo neghbours_out.
+        Agisce sul solo nodo: il grafo che lo contiene non ne viene informato (numero di archi,
+        indici, istantanea di freeze() e registro delle modifiche); per modificare un grafo si
+        usano i metodi di DirectedGraph.
 
         :param *new_neighbours_out: elenco di nuovi neighbours_out da aggiungere al nodo
         :param **edge_labels: etichette comuni da applicare ai nuovi lati (nodo, new_neighbours_out)
 
         :return:
         """
-        neighbours_out, _ = self.get_neighbours()
         for u in new_neighbours_out:
-            if u not in neighbours_out:
-                edge_labels_copy = edge_labels.copy()
-                self.neighbours_out.append((u, edge_labels_copy))
-            else:
-                ind_u = neighbours_out.index(u)
-                self.neighbours_out[ind_u][1].update(edge_labels)
+            self._registra(u)
+            self._set_out(u.id, edge_labels)
 
 
     def add_neighbours_in(self, *new_neighbours_in):
@@ -117,22 +394,21 @@ class DirGraphNode:
         :return:
         """
         for w in new_neighbours_in:
-            if w not in self.neighbours_in:
-                self.neighbours_in.append(w)
+            self._registra(w)
+            self._add_in(w.id)
 
 
     def rmv_neighbours_out (self, elenco):
         """
         Questo metodo rimuove dall'attributo neighbours_out tutte le tuple che contengono i nodi ui dati in elenco
+        Come add_neighbours_out, agisce sul solo nodo e non aggiorna il grafo che lo contiene.
 
         :param elenco: elenco dei nodi da rimuovere
 
         :return:
         """
         for nodo in elenco:
-            for vicino in self.neighbours_out:
-                if nodo.labels in vicino:
-                    self.neighbours_out.remove(vicino)
+            self._del_out(nodo.id)
 
                     
     def rmv_neighbours_in (self, elenco):
@@ -144,9 +420,7 @@ class DirGraphNode:
         :return:
         """
         for nodo in elenco:
-            for vicino in self.neighbours_in:
-                if nodo.labels in vicino:
-                    self.neighbours_in.remove(vicino)    
+            self._del_in(nodo.id)
 
 
 class DirectedGraph:
@@ -157,6 +431,26 @@ class DirectedGraph:
     - name -> stringa: contiene il nome del grafo.
     - default_weight -> double: contiene il peso di default di tutti gli archi non inizializzati
     - nodes ->  dizionario: contiene la corrispondenza id:nodo per ogni nodo del grafo
+
+    Gli ID assegnati automaticamente provengono da _prossimo_id, il contatore del primo ID mai
+    assegnato, e da _id_riciclati, la coda di priorita' degli ID minori liberati da rmv_nodes.
+
+    Le etichette di un arco (id_out, id_in) si leggono in tempo costante dal nodo id_out; il grafo
+    mantiene il numero di archi in _num_archi, aggiornato ad ogni aggiunta o rimozione di archi
+    e nodi, e conserva in _snapshot l'ultima istantanea FrozenGraph prodotta da freeze(),
+    scartata ad ogni modifica del grafo, e in _layout la disposizione dei nodi usata da plot(),
+    scartata quando si aggiungono o rimuovono nodi.
+
+    Dopo save() o functions.load_graph() il grafo e' associato alla cartella su disco (_cartella)
+    e registra in _registro ogni operazione di modifica (add_nodes, add_edges, add_edges_bulk,
+    update_edge_labels, rmv_edges, rmv_nodes): checkpoint() le accoda al file
+    "delta.log" della cartella, compact() le incorpora nei file di base.
+
+    Gli indici secondari sulle etichette, creati con create_node_index e create_edge_index, sono
+    conservati in _indici_nodi e _indici_archi (dizionari etichetta:LabelIndex) e aggiornati dai
+    metodi del grafo che modificano nodi, archi ed etichette; le modifiche fatte direttamente sui
+    nodi (labels, add_neighbours_out, ...) non vengono viste dagli indici. Gli indici non vengono
+    salvati su disco.
     
     """
     def __init__(self, name='noname_graph',
@@ -180,6 +474,15 @@ class DirectedGraph:
         self.name = name
         self.default_weight = default_weight
         self.nodes = {}
+        self._num_archi = 0
+        self._snapshot = None
+        self._cartella = None
+        self._registro = None
+        self._prossimo_id = 0
+        self._id_riciclati = []
+        self._indici_nodi = {}
+        self._indici_archi = {}
+        self._layout = None
         self.add_nodes(nodes, **node_labels)
         self.add_edges(edges, **edge_labels)
 
@@ -192,35 +495,71 @@ class DirectedGraph:
 
         :return:
         """
+        id_list = list(id_list)
+        self._modificato()
+        self._crea_nodi(id_list, node_labels)
+        self._registra("add_nodes", (id_list,), node_labels)
+
+    def _crea_nodi(self, id_list, node_labels):
+        """
+        Crea i nodi mancanti e aggiorna le etichette di quelli esistenti, senza registrare l'operazione.
+        """
+        indicizza = bool(self._indici_nodi) and bool(node_labels)
+        if indicizza:
+            self._aggiorna_indici_nodi(id_list, node_labels, rimuovi=True)
         for i in id_list:
             if i not in self.nodes.keys():
                 v = DirGraphNode(i, **node_labels)
+                v._nodi = self.nodes
                 self.nodes[i] = v
-            else:
+                self._layout = None
+            elif node_labels:
                 self.nodes[i].labels.update(node_labels)
+        if indicizza:
+            self._aggiorna_indici_nodi(id_list, node_labels, rimuovi=False)
 
     def auto_add_nodes(self, num, **node_labels):
         """
-        Questo metodo aggiunge al grafo un numero dato di nodi tutti con le stesse etichette.
+        Questo metodo aggiunge al grafo un numero dato di nodi tutti con le stesse etichette,
+        assegnando loro i primi ID liberi in ordine crescente.
         
         :param num: int che indica il numero di nodi da aggiungere
         :param **node_labels: (facoltativo) dizionario contenente le etichette comuni ai nodi da aggiungere
 
-        :return:
+        :return: lista_id: lista degli ID assegnati ai nuovi nodi
         """
-        idn=0
-        lista_id = []
-        for i in range(num):
-            trovato=False
-            while trovato==False:
-                if idn in self.nodes.keys():
-                    idn = idn +1
-                else:
-                    trovato=True
-                    n=idn
-                    idn = idn +1
-                    lista_id.append(n)
+        lista_id = self._alloca_id(num)
         self.add_nodes(lista_id, **node_labels)
+        return lista_id
+
+
+    def _alloca_id(self, num, esclusi=()):
+        """
+        Restituisce i primi num ID non ancora usati dai nodi del grafo, in ordine crescente.
+        Tutti gli ID minori di _prossimo_id sono usati oppure si trovano nella coda _id_riciclati
+        (riempita da rmv_nodes), quindi ogni ID si ottiene in tempo costante ammortizzato.
+        La coda puo' contenere piu' volte lo stesso ID (un nodo rimosso, ricreato e rimosso di
+        nuovo): le copie gia' scelte vengono scartate.
+        Il chiamante deve creare subito i nodi con gli ID restituiti.
+
+        :param num: int che indica il numero di ID richiesti
+        :param esclusi: (facoltativo) insieme di altri ID da non restituire
+        :return: lista_id
+        """
+        lista_id = []
+        scelti = set()
+        while len(lista_id) < num and self._id_riciclati:
+            idn = heappop(self._id_riciclati)
+            if idn not in self.nodes and idn not in esclusi and idn not in scelti:
+                lista_id.append(idn)
+                scelti.add(idn)
+        idn = self._prossimo_id
+        while len(lista_id) < num:
+            if idn not in self.nodes and idn not in esclusi:
+                lista_id.append(idn)
+            idn = idn + 1
+        self._prossimo_id = idn
+        return lista_id
             
 
     def add_edges(self, edge_list, **edge_labels):
@@ -235,59 +574,333 @@ class DirectedGraph:
         """
         if "weight" not in edge_labels.keys():
             edge_labels["weight"] = self.default_weight
+        edge_list = list(edge_list)
+        self._modificato()
+        if self._indici_archi:
+            self._aggiorna_indici_archi(edge_list, edge_labels, rimuovi=True)
     
         for edge in edge_list:
             i_out = edge[0]
             if i_out not in self.nodes.keys():
-                self.add_nodes([i_out])
+                self._crea_nodi([i_out], {})
             i_in = edge[1]
             if i_in not in self.nodes.keys():
-                add_nodes([i_in])
+                self._crea_nodi([i_in], {})
             w = self.nodes[i_out]
             u = self.nodes[i_in]
             
-            w.add_neighbours_out(u, **edge_labels.copy())
-            u.add_neighbours_in(w)
+            if w._set_out(u.id, edge_labels):
+                u._add_in(w.id)
+                self._num_archi = self._num_archi + 1
+        if self._indici_archi:
+            self._aggiorna_indici_archi(edge_list, edge_labels, rimuovi=False)
+        self._registra("add_edges", (edge_list,), edge_labels)
+
+    
+
+    def add_edges_bulk(self, sorgenti, destinazioni=None, pesi=None):
+        """
+        Questo metodo aggiunge in una sola passata un grande numero di archi con il solo peso come etichetta.
+        Gli archi possono essere dati come tre array (o liste) paralleli sorgenti, destinazioni, pesi,
+        oppure come un unico iterabile di tuple (id_out, id_in) o (id_out, id_in, peso).
+        I nodi mancanti vengono creati tutti insieme; gli archi vengono raggruppati per nodo di partenza
+        e di arrivo e inseriti nei dizionari dei nodi con un solo aggiornamento per gruppo.
+        Gli archi ripetuti, nel blocco o gia' presenti nel grafo, mantengono l'ultimo peso fornito.
+
+        :param sorgenti: array degli ID dei nodi di partenza, oppure iterabile di tuple
+        :param destinazioni: array degli ID dei nodi di arrivo. DEFAULT: None
+        :param pesi: (facoltativo) array dei pesi; se assente si usa default_weight. DEFAULT: None
+
+        :return:
+        """
+        if destinazioni is None:
+            archi = sorgenti if isinstance(sorgenti, np.ndarray) else list(sorgenti)
+            if isinstance(archi, np.ndarray):
+                sorgenti, destinazioni = archi[:, 0], archi[:, 1]
+                if archi.shape[1] > 2:
+                    pesi = archi[:, 2]
+            else:
+                sorgenti = [arco[0] for arco in archi]
+                destinazioni = [arco[1] for arco in archi]
+                if archi and len(archi[0]) > 2:
+                    pesi = [arco[2] for arco in archi]
+        sorgenti = np.asarray(sorgenti, dtype=np.int64)
+        destinazioni = np.asarray(destinazioni, dtype=np.int64)
+        if len(sorgenti) == 0:
+            return
+        self._modificato()
+        if self._registro is None:
+            argomenti = (sorgenti, destinazioni, pesi)
+        else:
+            # il registro conserva copie: il chiamante potrebbe riusare i propri array prima di checkpoint()
+            argomenti = (np.array(sorgenti), np.array(destinazioni),
+                         None if pesi is None else np.array(pesi, dtype=float))
+        if "weight" in self._indici_archi:
+            coppie = list(zip(sorgenti.tolist(), destinazioni.tolist()))
+            self._aggiorna_indici_archi(coppie, {"weight": None}, rimuovi=True)
+
+        ordine_out = np.argsort(sorgenti, kind="stable")
+        ordine_in = np.argsort(destinazioni, kind="stable")
+        partenze = sorgenti[ordine_out]
+        inizi_out = np.flatnonzero(np.r_[True, partenze[1:] != partenze[:-1]])
+        arrivi = destinazioni[ordine_in]
+        inizi_in = np.flatnonzero(np.r_[True, arrivi[1:] != arrivi[:-1]])
+        id_out = partenze[inizi_out].tolist()
+        id_in = arrivi[inizi_in].tolist()
+        mancanti = set(id_out).union(id_in).difference(self.nodes)
+        self._crea_nodi(sorted(mancanti), {})
+        nodi = self.nodes
+
+        vicini_out = destinazioni[ordine_out].tolist()
+        if pesi is None:
+            pesi = [self.default_weight] * len(sorgenti)
+        else:
+            pesi = np.asarray(pesi, dtype=float)[ordine_out].tolist()
+        fini = np.r_[inizi_out[1:], len(partenze)]
+        for inizio, fine, idn in zip(inizi_out.tolist(), fini.tolist(), id_out):
+            nodi[idn]._separa()
+            vicini = nodi[idn]._out
+            prima = len(vicini)
+            vicini.update(zip(vicini_out[inizio:fine], pesi[inizio:fine]))
+            self._num_archi = self._num_archi + len(vicini) - prima
+
+        vicini_in = sorgenti[ordine_in].tolist()
+        fini = np.r_[inizi_in[1:], len(arrivi)]
+        for inizio, fine, idn in zip(inizi_in.tolist(), fini.tolist(), id_in):
+            nodi[idn]._separa()
+            nodi[idn]._in.update(vicini_in[inizio:fine])
+        if "weight" in self._indici_archi:
+            self._aggiorna_indici_archi(coppie, {"weight": None}, rimuovi=False)
+        self._registra("add_edges_bulk", argomenti, {})
 
     
 
+    def iter_edges(self):
+        """
+        Questo metodo restituisce un generatore che produce, un arco alla volta, tuple
+        (id_out, id_in, etichette) senza costruire l'elenco completo degli archi.
+
+        :return: generatore di tuple (id_out, id_in, etichette)
+        """
+        for nodo in self.nodes.values():
+            for idn in nodo._out:
+                yield nodo.id, idn, nodo._etichette(idn)
+
+
+    def export_edges(self, fileobj, formato="csv"):
+        """
+        Questo metodo scrive gli archi del grafo su un file di testo aperto, una riga per arco,
+        scorrendo iter_edges senza tenere in memoria l'elenco degli archi.
+
+        :param fileobj: file di testo aperto in scrittura
+        :param formato:
+                    csv: colonne separate da virgole con intestazione source, target, weight
+                         seguita da una colonna per ogni etichetta usata dagli archi
+                    tsv: come csv, con colonne separate da tabulazioni
+                    jsonl: un oggetto JSON per riga con le chiavi source, target e labels, che
+                           contiene il dizionario delle etichette dell'arco (peso compreso), cosi'
+                           che un'etichetta di nome "source" o "target" non si confonda con gli estremi
+                    DEFAULT: "csv"
+        :return:
+        """
+        if formato == "jsonl":
+            for id_out, id_in, etichette in self.iter_edges():
+                riga = {"source": id_out, "target": id_in, "labels": etichette}
+                fileobj.write(json.dumps(riga) + "\n")
+            return
+
+        chiavi = set()
+        for nodo in self.nodes.values():
+            if nodo._extra is not None:
+                for extra in nodo._extra.values():
+                    chiavi.update(extra)
+        chiavi = sorted(chiavi)
+        scrittore = csv.writer(fileobj, delimiter="\t" if formato == "tsv" else ",")
+        scrittore.writerow(["source", "target", "weight"] + chiavi)
+        for id_out, id_in, etichette in self.iter_edges():
+            scrittore.writerow([id_out, id_in, etichette.get("weight", "")] +
+                               [etichette.get(chiave, "") for chiave in chiavi])
+
+
+    def add_edges_from_stream(self, fileobj, formato="csv", blocco=100000, tipi=None):
+        """
+        Questo metodo aggiunge al grafo gli archi letti da un file di testo aperto, nel formato
+        scritto da export_edges. Il file viene letto una riga alla volta e gli archi vengono
+        inseriti a blocchi di al piu' blocco righe tramite add_edges_bulk, che crea anche i nodi
+        mancanti; la memoria usata dipende quindi dalla dimensione del blocco e non da quella del file.
+
+        Gli ID dei nodi vengono letti come interi e, nei formati csv e tsv, il peso come numero
+        reale; le altre colonne diventano etichette dell'arco (le celle vuote vengono ignorate).
+        Gli archi senza peso ricevono default_weight.
+        Nei formati csv e tsv le etichette diverse dal peso sono lette come stringhe, a meno che
+        tipi non indichi come convertirle; nel formato jsonl mantengono i tipi JSON con cui sono
+        state scritte.
+
+        :param fileobj: file di testo aperto in lettura, oppure un qualsiasi iterabile di righe
+        :param formato: "csv", "tsv" oppure "jsonl". DEFAULT: "csv"
+        :param blocco: numero massimo di archi letti prima di inserirli nel grafo. DEFAULT: 100000
+        :param tipi: (facoltativo) dizionario etichetta:funzione di conversione (ad esempio
+                     {"lunghezza": int}) applicata, nei formati csv e tsv, ai valori di quella
+                     colonna. DEFAULT: None
+
+        :return:
+        """
+        sorgenti, destinazioni, pesi, etichette = [], [], [], []
+        for id_out, id_in, peso, extra in self._leggi_archi(fileobj, formato, tipi):
+            sorgenti.append(id_out)
+            destinazioni.append(id_in)
+            pesi.append(self.default_weight if peso is None else peso)
+            if extra:
+                etichette.append((id_out, id_in, extra))
+            if len(sorgenti) >= blocco:
+                self._carica_blocco(sorgenti, destinazioni, pesi, etichette)
+                sorgenti, destinazioni, pesi, etichette = [], [], [], []
+        self._carica_blocco(sorgenti, destinazioni, pesi, etichette)
+
+
+    def _leggi_archi(self, fileobj, formato, tipi=None):
+        """
+        Generatore che legge le righe di un file di archi e produce tuple (id_out, id_in, peso, etichette),
+        con peso None se assente. Nei formati csv e tsv le etichette sono convertite con le funzioni
+        in tipi, se presenti, e altrimenti restano stringhe.
+        """
+        if formato == "jsonl":
+            for riga in fileobj:
+                if riga.strip():
+                    arco = json.loads(riga)
+                    extra = arco.get("labels", {})
+                    yield int(arco["source"]), int(arco["target"]), extra.pop("weight", None), extra
+            return
+
+        lettore = csv.reader(fileobj, delimiter="\t" if formato == "tsv" else ",")
+        intestazione = next(lettore, None)
+        if intestazione is None:
+            return
+        if tipi is None:
+            tipi = {}
+        for riga in lettore:
+            if not riga:
+                continue
+            extra = {}
+            peso = None
+            for chiave, valore in zip(intestazione[2:], riga[2:]):
+                if valore == "":
+                    continue
+                if chiave == "weight":
+                    peso = float(valore)
+                elif chiave in tipi:
+                    extra[chiave] = tipi[chiave](valore)
+                else:
+                    extra[chiave] = valore
+            yield int(riga[0]), int(riga[1]), peso, extra
+
+
+    def _carica_blocco(self, sorgenti, destinazioni, pesi, etichette):
+        """
+        Inserisce un blocco di archi letto da add_edges_from_stream: prima i pesi con add_edges_bulk,
+        poi, nell'ordine di lettura, le eventuali etichette diverse dal peso.
+        """
+        self.add_edges_bulk(sorgenti, destinazioni, pesi)
+        for id_out, id_in, extra in etichette:
+            self.update_edge_labels([(id_out, id_in)], **extra)
+
+
+    def update_edge_labels(self, edge_list, **edge_labels):
+        """
+        Questo metodo aggiorna le etichette degli archi dati, se esistono, senza crearne di nuovi
+        e senza modificarne il peso a meno che non sia indicato nella chiave "weight".
+
+        :param edge_list: lista di tuple contenenti gli ID degli archi da aggiornare
+        :param **edge_labels: dizionario contenente le etichette da assegnare agli archi
+
+        :return:
+        """
+        edge_list = list(edge_list)
+        self._modificato()
+        if self._indici_archi:
+            self._aggiorna_indici_archi(edge_list, edge_labels, rimuovi=True)
+        for edge in edge_list:
+            w = self.nodes.get(edge[0])
+            if w is not None and edge[1] in w._out:
+                w._set_out(edge[1], edge_labels)
+        if self._indici_archi:
+            self._aggiorna_indici_archi(edge_list, edge_labels, rimuovi=False)
+        self._registra("update_edge_labels", (edge_list,), edge_labels)
+
+
     def rmv_edges(self, edge_list):
         """
         Questo metodo rimuove gli archi dati in input dagli archi del grafo.
+        Gli archi che non esistono, anche perche' uno dei due nodi non esiste, vengono ignorati.
         
         :param edge_list: lista di tuple contenenti gli ID che identificano gli archi da rimuovere
 
         :return:
         """
+        edge_list = list(edge_list)
+        self._modificato()
+        self._rimuovi_archi(edge_list)
+        self._registra("rmv_edges", (edge_list,), {})
+
+    def _rimuovi_archi(self, edge_list):
+        """
+        Rimuove gli archi dati senza registrare l'operazione.
+        """
+        if self._indici_archi:
+            self._aggiorna_indici_archi(edge_list, self._indici_archi, rimuovi=True)
         for edge in edge_list:
             i_out = edge[0]
             i_in = edge[1]
-            w = self.nodes[i_out]
-            u = self.nodes[i_in]
-            if u in w.get_neighbours()[0]:
-                w.neighbours_out.pop(w.get_neighbours()[0].index(u))
-            if w in u.neighbours_in:
-                u.neighbours_in.remove(w)
+            w = self.nodes.get(i_out)
+            u = self.nodes.get(i_in)
+            if w is None or u is None:
+                continue
+            if w._del_out(i_in):
+                self._num_archi = self._num_archi - 1
+            u._del_in(i_out)
 
 
 
     def rmv_nodes (self, lista_id):
         """
-        Questo metodo rimuove i nodi dati in input dai nodi del grafo.
+        Questo metodo rimuove i nodi dati in input dai nodi del grafo insieme a tutti gli archi
+        che li toccano. Ogni nodo viene staccato dai soli vicini, usando gli insiemi degli archi
+        uscenti ed entranti, quindi il costo e' proporzionale alla somma dei gradi dei nodi rimossi.
+        Gli archi tra due nodi entrambi da rimuovere non vengono toccati singolarmente.
+        Gli ID non presenti nel grafo vengono ignorati.
         
         :param lista_id: lista di ID che identificano i nodi da rimuovere
 
         :return:
         """
-        for idn in lista_id:
-            edge_list=[]
-            for nodo in self.nodes[idn].get_neighbours()[0]:
-                edge_list.append((self.nodes[idn].id,nodo.id))
-            for nodo in self.nodes[idn].get_neighbours()[1]:
-                edge_list.append((nodo.id,self.nodes[idn].id))
-            print (edge_list)
-            self.rmv_edges(edge_list)
-            del self.nodes[idn]
+        lista_id = list(lista_id)
+        self._modificato()
+        nodi = self.nodes
+        rimossi = {idn for idn in lista_id if idn in nodi}
+        if self._indici_nodi:
+            self._aggiorna_indici_nodi(rimossi, self._indici_nodi, rimuovi=True)
+        if self._indici_archi:
+            incidenti = [(idn, vicino) for idn in rimossi for vicino in nodi[idn]._out]
+            incidenti.extend((vicino, idn) for idn in rimossi for vicino in nodi[idn]._in
+                             if vicino not in rimossi)
+            self._aggiorna_indici_archi(incidenti, self._indici_archi, rimuovi=True)
+        for idn in rimossi:
+            nodo = nodi[idn]
+            for vicino in nodo._out:
+                if vicino not in rimossi:
+                    nodi[vicino]._del_in(idn)
+            for vicino in nodo._in:
+                if vicino not in rimossi:
+                    nodi[vicino]._del_out(idn)
+                    self._num_archi = self._num_archi - 1
+            self._num_archi = self._num_archi - len(nodo._out)
+        if rimossi:
+            self._layout = None
+        for idn in rimossi:
+            del nodi[idn]
+            if isinstance(idn, Integral) and idn < self._prossimo_id:
+                heappush(self._id_riciclati, int(idn))
+        self._registra("rmv_nodes", (lista_id,), {})
 
 
     def get_edges (self):
@@ -298,8 +911,8 @@ class DirectedGraph:
         """
         edge_list=[]
         for nodo in self.nodes.values():
-            for out in nodo.get_neighbours()[0]:
-                edge_list.append((nodo.id,out.id))
+            for idn in nodo._out:
+                edge_list.append((nodo.id,idn))
         return edge_list
 
 
@@ -311,121 +924,519 @@ class DirectedGraph:
         :return: lista
         """
         lista=[]
-        dizionario={}
         for edge in edge_list:
-            if edge not in self.get_edges():
-                dizionario[edge]=None
-                lista.append(dizionario.copy())
-            else :
-                for n in self.nodes[edge[0]].neighbours_out:
-                    if n[0].id==edge[1]:
-                        dizionario[edge]=n[1]
-                        if dizionario[edge] not in lista:
-                            lista.append(dizionario.copy())
-                        dizionario.clear()
+            w = self.nodes.get(edge[0])
+            if w is None or edge[1] not in w._out:
+                lista.append({edge: None})
+            else:
+                lista.append({edge: w._etichette(edge[1])})
         return lista
 
 
+    def edge_label_column(self, edge_list, etichetta="weight", mancante=np.nan):
+        """
+        Questo metodo legge una sola etichetta per un grande numero di archi e la restituisce come
+        colonna numpy, nello stesso ordine degli archi richiesti. Gli archi possono essere dati come
+        lista di tuple (id_out, id_in) oppure come array di forma (k, 2).
+
+        :param edge_list: lista di tuple o array (k, 2) degli archi da leggere
+        :param etichetta: nome dell'etichetta da leggere. DEFAULT: "weight"
+        :param mancante: valore usato per gli archi o le etichette inesistenti. DEFAULT: np.nan
+        :return: array numpy di lunghezza k (float se possibile, altrimenti object)
+        """
+        if isinstance(edge_list, np.ndarray):
+            edge_list = zip(edge_list[:, 0].tolist(), edge_list[:, 1].tolist())
+        nodi = self.nodes
+        valori = []
+        for id_out, id_in in edge_list:
+            w = nodi.get(id_out)
+            valori.append(mancante if w is None else w._etichetta(id_in, etichetta, mancante))
+        return _colonna(valori)
+
+    def node_label_column(self, id_list, etichetta, mancante=np.nan):
+        """
+        Questo metodo legge una sola etichetta per un elenco di nodi e la restituisce come colonna
+        numpy, nello stesso ordine dei nodi richiesti.
+
+        :param id_list: lista o array degli ID dei nodi da leggere
+        :param etichetta: nome dell'etichetta da leggere
+        :param mancante: valore usato per i nodi o le etichette inesistenti. DEFAULT: np.nan
+        :return: array numpy (float se possibile, altrimenti object)
+        """
+        if isinstance(id_list, np.ndarray):
+            id_list = id_list.tolist()
+        nodi = self.nodes
+        valori = []
+        for idn in id_list:
+            v = nodi.get(idn)
+            if v is None or not v._labels:
+                valori.append(mancante)
+            else:
+                valori.append(v._labels.get(etichetta, mancante))
+        return _colonna(valori)
+
+    def filter_nodes(self, **predicati):
+        """
+        Questo metodo restituisce gli ID dei nodi le cui etichette soddisfano tutti i predicati dati.
+        Ogni predicato e' un valore, confrontato per uguaglianza, oppure una funzione che riceve il
+        valore dell'etichetta e restituisce un bool; i nodi privi dell'etichetta vengono scartati.
+        Esempio: filter_nodes(colore="rosso", eta=lambda x: x > 30)
+
+        :param **predicati: dizionario etichetta:valore o etichetta:funzione
+        :return: lista_id
+        """
+        candidati = _candidati(self._indici_nodi, predicati)
+        if candidati is not None:
+            return [idn for idn in candidati if _soddisfa(self.nodes[idn]._labels.get, predicati)]
+        lista_id = []
+        for idn, nodo in self.nodes.items():
+            etichette = nodo._labels
+            if not predicati or (etichette and _soddisfa(etichette.get, predicati)):
+                lista_id.append(idn)
+        return lista_id
+
+    def filter_edges(self, **predicati):
+        """
+        Questo metodo restituisce gli archi le cui etichette soddisfano tutti i predicati dati, con
+        le stesse regole di filter_nodes. Il peso si indica con la chiave "weight".
+        Esempio: filter_edges(weight=lambda p: p < 2, colore="blu")
+
+        :param **predicati: dizionario etichetta:valore o etichetta:funzione
+        :return: edge_list
+        """
+        candidati = _candidati(self._indici_archi, predicati)
+        if candidati is not None:
+            nodi = self.nodes
+            return [(id_out, id_in) for id_out, id_in in candidati
+                    if _soddisfa(lambda chiave, mancante: nodi[id_out]._etichetta(id_in, chiave, mancante), predicati)]
+        edge_list = []
+        for nodo in self.nodes.values():
+            for idn in nodo._out:
+                if _soddisfa(lambda chiave, mancante: nodo._etichetta(idn, chiave, mancante), predicati):
+                    edge_list.append((nodo.id, idn))
+        return edge_list
+
+    def create_node_index(self, chiave):
+        """
+        Questo metodo crea un indice secondario sull'etichetta dei nodi indicata, cosi' che
+        find_nodes e filter_nodes non debbano scorrere tutto il grafo. L'indice viene costruito
+        con una sola scansione e poi aggiornato da add_nodes e rmv_nodes.
+
+        :param chiave: nome dell'etichetta da indicizzare
+        :return:
+        """
+        indice = LabelIndex(chiave)
+        for idn, nodo in self.nodes.items():
+            if nodo._labels and chiave in nodo._labels:
+                indice.aggiungi(nodo._labels[chiave], idn)
+        self._indici_nodi[chiave] = indice
+
+    def create_edge_index(self, chiave):
+        """
+        Questo metodo crea un indice secondario sull'etichetta degli archi indicata (anche "weight"),
+        aggiornato poi da add_edges, add_edges_bulk, update_edge_labels, rmv_edges e rmv_nodes.
+
+        :param chiave: nome dell'etichetta da indicizzare
+        :return:
+        """
+        indice = LabelIndex(chiave)
+        for nodo in self.nodes.values():
+            for idn in nodo._out:
+                valore = nodo._etichetta(idn, chiave, _ASSENTE)
+                if valore is not _ASSENTE:
+                    indice.aggiungi(valore, (nodo.id, idn))
+        self._indici_archi[chiave] = indice
+
+    def drop_node_index(self, chiave):
+        """
+        Questo metodo elimina, se esiste, l'indice sull'etichetta dei nodi indicata.
+
+        :param chiave: nome dell'etichetta
+        :return:
+        """
+        self._indici_nodi.pop(chiave, None)
+
+    def drop_edge_index(self, chiave):
+        """
+        Questo metodo elimina, se esiste, l'indice sull'etichetta degli archi indicata.
+
+        :param chiave: nome dell'etichetta
+        :return:
+        """
+        self._indici_archi.pop(chiave, None)
+
+    def find_nodes(self, chiave, valore=_ASSENTE, minimo=None, massimo=None):
+        """
+        Questo metodo restituisce gli ID dei nodi la cui etichetta chiave e' uguale a valore oppure,
+        se valore non e' indicato, compresa tra minimo e massimo (estremi inclusi).
+        Se esiste un indice su chiave la ricerca non scorre il grafo, altrimenti equivale a filter_nodes.
+
+        :param chiave: nome dell'etichetta
+        :param valore: (facoltativo) valore cercato
+        :param minimo: (facoltativo) estremo inferiore dell'intervallo. DEFAULT: None
+        :param massimo: (facoltativo) estremo superiore dell'intervallo. DEFAULT: None
+        :return: lista_id
+        """
+        indice = self._indici_nodi.get(chiave)
+        if indice is not None:
+            return indice.uguale(valore) if valore is not _ASSENTE else indice.intervallo(minimo, massimo)
+        if valore is not _ASSENTE:
+            return self.filter_nodes(**{chiave: valore})
+        return self.filter_nodes(**{chiave: lambda x: _nell_intervallo(x, minimo, massimo)})
+
+    def find_edges(self, chiave, valore=_ASSENTE, minimo=None, massimo=None):
+        """
+        Questo metodo restituisce gli archi la cui etichetta chiave e' uguale a valore oppure
+        compresa tra minimo e massimo, con le stesse regole di find_nodes.
+
+        :param chiave: nome dell'etichetta (anche "weight")
+        :param valore: (facoltativo) valore cercato
+        :param minimo: (facoltativo) estremo inferiore dell'intervallo. DEFAULT: None
+        :param massimo: (facoltativo) estremo superiore dell'intervallo. DEFAULT: None
+        :return: edge_list
+        """
+        indice = self._indici_archi.get(chiave)
+        if indice is not None:
+            return indice.uguale(valore) if valore is not _ASSENTE else indice.intervallo(minimo, massimo)
+        if valore is not _ASSENTE:
+            return self.filter_edges(**{chiave: valore})
+        return self.filter_edges(**{chiave: lambda x: _nell_intervallo(x, minimo, massimo)})
+
+    def _aggiorna_indici_nodi(self, id_list, chiavi, rimuovi):
+        """
+        Toglie (rimuovi=True) o aggiunge agli indici sulle etichette in chiavi i valori attuali
+        delle etichette dei nodi dati. Va chiamato con rimuovi=True prima di una modifica e con
+        rimuovi=False dopo.
+        """
+        for chiave in chiavi:
+            indice = self._indici_nodi.get(chiave)
+            if indice is None:
+                continue
+            operazione = indice.rimuovi if rimuovi else indice.aggiungi
+            for idn in id_list:
+                nodo = self.nodes.get(idn)
+                if nodo is not None and nodo._labels and chiave in nodo._labels:
+                    operazione(nodo._labels[chiave], idn)
+
+    def _aggiorna_indici_archi(self, edge_list, chiavi, rimuovi):
+        """
+        Come _aggiorna_indici_nodi, per le etichette degli archi dati; gli archi inesistenti
+        vengono ignorati.
+        """
+        for chiave in chiavi:
+            indice = self._indici_archi.get(chiave)
+            if indice is None:
+                continue
+            operazione = indice.rimuovi if rimuovi else indice.aggiungi
+            for edge in edge_list:
+                w = self.nodes.get(edge[0])
+                if w is not None:
+                    valore = w._etichetta(edge[1], chiave, _ASSENTE)
+                    if valore is not _ASSENTE:
+                        operazione(valore, (edge[0], edge[1]))
+
+
     def size(self):
         """
         Questo metdo restituisce il numero di nodi e il numero di archi che compongono il grafo.
+        Il numero di archi e' il contatore _num_archi aggiornato dai metodi di DirectedGraph: le
+        modifiche fatte direttamente sui nodi (add_neighbours_out, rmv_neighbours_out, ...) non
+        lo aggiornano.
         
-        :return: len(self.nodes), len(self.get_edges())
+        :return: len(self.nodes), self._num_archi
         """
-        return len(self.nodes), len(self.get_edges())
+        return len(self.nodes), self._num_archi
 
 
     def copy(self):
         """
         Questo metodo crea un nuovo grafo che è una esatta copia del grafo al quale viene applicato il metodo
-        
-        :return: deepcopy(self)
+
+        La copia e' copy-on-write: vengono creati solo i nuovi oggetti DirGraphNode (con una copia
+        delle eventuali etichette del nodo), che condividono con gli originali i dizionari dei vicini
+        e delle etichette degli archi; questi vengono duplicati, per il solo nodo interessato, alla
+        prima modifica da una delle due parti. Il costo non dipende quindi dal numero di archi.
+        La copia non e' associata ad alcuna cartella e non registra le operazioni.
+
+        :return: copia
+        """
+        copia = DirectedGraph(self.name, self.default_weight)
+        for idn, nodo in self.nodes.items():
+            copia.nodes[idn] = nodo._copia_condivisa(copia.nodes)
+        copia._num_archi = self._num_archi
+        copia._snapshot = self._snapshot
+        copia._prossimo_id = self._prossimo_id
+        copia._id_riciclati = list(self._id_riciclati)
+        copia._indici_nodi = {chiave: indice.copia() for chiave, indice in self._indici_nodi.items()}
+        copia._indici_archi = {chiave: indice.copia() for chiave, indice in self._indici_archi.items()}
+        copia._layout = self._layout
+        return copia
+
+
+    def _modificato(self):
         """
-        return deepcopy(self)
+        Va chiamato da ogni metodo che modifica nodi o archi: scarta l'istantanea prodotta da freeze().
 
+        :return:
+        """
+        self._snapshot = None
+
+
+    def _registra(self, operazione, argomenti, etichette):
+        """
+        Va chiamato alla fine di ogni metodo pubblico di modifica elementare, dopo che l'operazione
+        e' riuscita (all'inizio il metodo chiama _modificato): scarta l'istantanea e, se il grafo
+        e' associato a una cartella, accoda l'operazione al registro delle modifiche. Un'operazione
+        interrotta da un'eccezione non entra quindi nel registro e non viene ripetuta al caricamento.
+
+        :param operazione: nome del metodo da richiamare per ripetere l'operazione
+        :param argomenti: tupla degli argomenti posizionali del metodo
+        :param etichette: dizionario degli argomenti con nome del metodo
+        :return:
+        """
+        self._modificato()
+        if self._registro is not None:
+            self._registro.append((operazione, argomenti, dict(etichette)))
+
+
+    def checkpoint(self):
+        """
+        Questo metodo accoda al file "delta.log" della cartella associata al grafo (con save()
+        o functions.load_graph()) le operazioni di modifica eseguite dall'ultimo checkpoint:
+        il costo e' proporzionale al numero di modifiche e non alla dimensione del grafo.
+
+        Se il grafo non e' associato ad alcuna cartella si riceve un messaggio di errore
+        "il grafo non e' associato ad alcuna cartella" e non viene scritto nulla.
 
-    def compute_adjacency(self,tipo="D"):
+        :return:
+        """
+        if self._cartella is None:
+            print("il grafo non e' associato ad alcuna cartella")
+            return
+        with open(os.path.join(_cartella_base(self._cartella), "delta.log"), "ab") as file_registro:
+            for operazione in self._registro:
+                dump(operazione, file_registro)
+        self._registro = []
+
+
+    def compact(self):
+        """
+        Questo metodo scrive nel formato "npy" un nuovo insieme di file di base, che incorporano
+        tutte le modifiche, in una nuova sottocartella "base_<n>" della cartella associata al grafo,
+        senza file "delta.log", e poi la rende quella corrente sostituendo con os.replace il file
+        "CURRENT" che la indica. Il passaggio avviene con un'unica rinomina: chi carica la cartella
+        vede o i vecchi file di base con il loro registro o i nuovi, e un'interruzione durante la
+        scrittura lascia intatti i precedenti. Viene conservata la sola cartella di base precedente,
+        per i lettori che l'avevano gia' aperta; le altre vengono eliminate.
+
+        Se il grafo non e' associato ad alcuna cartella si riceve un messaggio di errore
+        "il grafo non e' associato ad alcuna cartella" e non viene scritto nulla.
+
+        :return:
+        """
+        if self._cartella is None:
+            print("il grafo non e' associato ad alcuna cartella")
+            return
+        vecchia = _cartella_base(self._cartella)
+        if vecchia == self._cartella:
+            numero = 1
+        else:
+            numero = int(os.path.basename(vecchia).split("_")[1]) + 1
+        nome = "base_" + str(numero)
+        nuova = os.path.join(self._cartella, nome)
+        shutil.rmtree(nuova, ignore_errors=True)
+        os.mkdir(nuova)
+        self._scrivi(nuova, "npy")
+        puntatore = os.path.join(self._cartella, "CURRENT")
+        with open(puntatore + ".tmp", "w") as file_puntatore:
+            file_puntatore.write(nome)
+        os.replace(puntatore + ".tmp", puntatore)
+        self._registro = []
+
+        for voce in os.listdir(self._cartella):
+            percorso_voce = os.path.join(self._cartella, voce)
+            if voce.startswith("base_") and percorso_voce not in (nuova, vecchia):
+                shutil.rmtree(percorso_voce, ignore_errors=True)
+        if vecchia != self._cartella:
+            for voce in ["delta.log", "attributes.pkl", "edge_labels.pkl", "id_list.pkl",
+                         "adjacency.pkl"] + [nome_array + ".npy" for nome_array in ARRAYS]:
+                try:
+                    os.remove(os.path.join(self._cartella, voce))
+                except OSError:
+                    pass
+
+
+    def _riapplica_registro(self, percorso):
+        """
+        Ripete sul grafo, nell'ordine, le operazioni salvate nel file "delta.log" della cartella data.
+
+        :param percorso: il percorso della cartella
+        :return: numero di operazioni ripetute
+        """
+        percorso_registro = os.path.join(_cartella_base(percorso), "delta.log")
+        if not os.path.exists(percorso_registro):
+            return 0
+        n = 0
+        with open(percorso_registro, "rb") as file_registro:
+            while True:
+                try:
+                    operazione, argomenti, etichette = load(file_registro)
+                except EOFError:
+                    break
+                getattr(self, operazione)(*argomenti, **etichette)
+                n = n + 1
+        return n
+
+
+    def freeze(self):
+        """
+        Questo metodo restituisce un'istantanea immutabile del grafo in forma CSR (vedi FrozenGraph),
+        su cui eseguire cammini minimi, interrogazioni sui gradi e visite senza passare per gli
+        oggetti DirGraphNode. L'istantanea e' conservata e riutilizzata finche' il grafo non
+        viene modificato tramite i suoi metodi.
+
+        :return: FrozenGraph
+        """
+        if self._snapshot is None:
+            righe, colonne, pesi, _ = self.adjacency_arrays(compatta=True)
+            self._snapshot = FrozenGraph.from_arrays(self.compact_ids(), righe, colonne, pesi, self.name)
+        return self._snapshot
+
+
+    def compact_ids(self):
+        """
+        Questo metodo restituisce l'array ordinato degli ID dei nodi: la posizione di un ID
+        nell'array e' l'indice compatto (riga/colonna) usato per quel nodo nelle matrici di adiacenza.
+
+        :return: np.array di ID
+        """
+        return np.array(sorted(self.nodes.keys()), dtype=np.int64)
+
+
+    def adjacency_arrays(self, compatta=False):
+        """
+        Questo metodo scorre una sola volta gli archi dei nodi e restituisce tre array NumPy
+        (righe, colonne, pesi) in formato COO, da cui costruire la matrice di adiacenza.
+
+        :param compatta: se True righe e colonne sono gli indici compatti dati da compact_ids(),
+                         altrimenti coincidono con gli ID dei nodi. DEFAULT: False
+        :return: righe, colonne, pesi, dimensione
+        """
+        nodi = list(self.nodes.values())
+        gradi = np.fromiter((len(nodo._out) for nodo in nodi), dtype=np.int64, count=len(nodi))
+        numero_archi = int(gradi.sum())
+        righe = np.repeat(np.fromiter((nodo.id for nodo in nodi), dtype=np.int64, count=len(nodi)), gradi)
+        colonne = np.fromiter(chain.from_iterable(nodo._out.keys() for nodo in nodi),
+                              dtype=np.int64, count=numero_archi)
+        pesi = np.fromiter(chain.from_iterable(nodo._out.values() for nodo in nodi),
+                           dtype=float, count=numero_archi)
+        if compatta:
+            ids = self.compact_ids()
+            righe = np.searchsorted(ids, righe)
+            colonne = np.searchsorted(ids, colonne)
+            dimensione = len(ids)
+        elif self.nodes:
+            dimensione = max(self.nodes.keys()) + 1
+        else:
+            dimensione = 0
+        return righe, colonne, pesi, dimensione
+
+
+    def compute_adjacency(self,tipo="D",compatta=False):
         """
         Questo metodo computa la matrice di adiacenza del grafo e l'utente ha a possibilità
         di specificare se essa deve essere restituita in forma densa o sparsa specificando nel parametro di input
         una D o una S, rispettivamente.
+        La matrice viene costruita con una sola passata sugli archi tramite adjacency_arrays.
 
         :param tipo:
-                    D: matrice viene computata in forma densa
-                    S: matrice viene computata in forma sparsa
+                    D: matrice viene computata in forma densa (np.matrix)
+                    A: matrice viene computata in forma densa (np.ndarray)
+                    S: matrice viene computata in forma sparsa (dok_matrix)
+                    CSR: matrice viene computata in forma sparsa (csr_matrix)
+                    COO: matrice viene computata in forma sparsa (coo_matrix)
+        :param compatta: se True la riga/colonna i corrisponde al nodo con ID compact_ids()[i],
+                         altrimenti all'ID i e la matrice ha dimensione max(ID)+1. DEFAULT: False
         :return: m
         """
-        
-        id_list=self.nodes.keys()
-        massimo=max(id_list) + 1
-        
-        matrice=[]
-        for i in range(massimo):
-            riga=[]
-            if i not in id_list:
-                for j in range (massimo):
-                    riga.append(0)
-                    print("aggiungo uno 0 alla riga " + str(i) + " in posizione " + str(j))
-            else:
-                for j in range (massimo):
-                    if j in id_list:
-                        if (i,j) in self.get_edges():
-                            riga.append(self.get_edges_labels([(i,j)])[0][(i,j)]["weight"])
-                        else:
-                            riga.append(0)
-                    else:
-                        riga.append(0)
-            matrice.append(riga.copy())
-            riga.clear()
-             
-        m=np.asmatrix(np.array(matrice))
-        
-        if tipo=="S":
-            m=dok_matrix(m)
-        return m        
+        righe, colonne, pesi, dimensione = self.adjacency_arrays(compatta)
+        if tipo not in ("S", "CSR", "COO"):
+            m = np.zeros((dimensione, dimensione))
+            m[righe, colonne] = pesi
+            return m if tipo=="A" else np.asmatrix(m)
+
+        from scipy.sparse import coo_matrix
+        m = coo_matrix((pesi, (righe, colonne)), shape=(dimensione, dimensione))
+        if tipo=="COO":
+            return m
+        if tipo=="CSR":
+            return m.tocsr()
+        return m.todok()
 
     def add_from_adjacency(self, matrice):
         """
         aggiunge al grafo dei nodi e gli archi che li collegano partendo da una matrice di adiacenza
+        quadrata, densa (array o matrice numpy, lista di liste) oppure sparsa (scipy.sparse).
+        Gli elementi non nulli vengono estratti tutti insieme (tocoo per le matrici sparse, nonzero
+        per quelle dense) e gli archi inseriti con un'unica chiamata ad add_edges_bulk.
 
         :param matrice: matrice: la matrice di adiacenza dalla quale copiare i dati
-        :return:
+        :return: lista_id: lista degli ID assegnati ai nodi, nell'ordine delle righe della matrice
 
         """
-        id_list=[]
-        for i in range(matrice.shape[0]):
-            self.auto_add_nodes(1)
-            id_list.append(list(self.nodes.keys())[len(self.nodes.keys())-1])
-        
-        for i in range(matrice.shape[0]):
-            for j in range( matrice.shape[1]):
-                if matrice[i,j]!=0:
-                    self.add_edges([(id_list[i],id_list[j])],weight=matrice[i,j])
+        if not hasattr(matrice, "tocoo"):
+            matrice = np.asarray(matrice)
+        if len(matrice.shape) != 2 or matrice.shape[0] != matrice.shape[1]:
+            print("input invalidi")
+            return None
+
+        if hasattr(matrice, "tocoo"):
+            coo = matrice.tocsr()
+            coo.sum_duplicates()
+            coo = coo.tocoo()
+            righe, colonne, pesi = coo.row, coo.col, coo.data
+            non_nulli = pesi != 0
+            righe, colonne, pesi = righe[non_nulli], colonne[non_nulli], pesi[non_nulli]
+        else:
+            righe, colonne = matrice.nonzero()
+            pesi = matrice[righe, colonne]
+        id_list = np.array(self.auto_add_nodes(matrice.shape[0]), dtype=np.int64)
+        self.add_edges_bulk(id_list[righe], id_list[colonne], pesi)
+        return id_list.tolist()
 
     def add_graph(self, grafo):
         """
-        aggiunge al grafo tutti gli elementi di un altro grafo dato in input
+        aggiunge al grafo tutti gli elementi di un altro grafo dato in input.
+        I nodi di grafo mantengono il proprio ID se libero, altrimenti ricevono i primi ID non usati
+        da nessuno dei due grafi; la tabella di rinumerazione si calcola con una sola passata e gli
+        archi vengono inseriti con add_edges_bulk. Il grafo dato in input non viene modificato.
 
         :param grafo:grafo dal quale copiare i dati
-        :return:
+        :return: dizionario id in grafo:nuovo id dei soli nodi rinumerati
         """
-        #self.add_from_adjacency(grafo.compute_adjacency("S"))
-        grafo_tmp=grafo.nodes.copy()
-        lista_nuovi_id=[]
-        for idn, value in grafo.nodes.items():
-            if idn in self.nodes.keys():
-                trovato=False
-                nuovo_id=0
-                while trovato==False:
-                    if (nuovo_id in self.nodes.keys()) or (nuovo_id in lista_nuovi_id):
-                        nuovo_id = nuovo_id +1
-                    else:
-                        trovato=True
-                        lista_nuovi_id.append(nuovo_id)
-                        value.id=nuovo_id
-                        grafo_tmp[nuovo_id]=value
-                        del grafo_tmp[idn]
-        self.nodes.update(grafo_tmp)
+        conflitti = [idn for idn in grafo.nodes if idn in self.nodes]
+        mappa = dict(zip(conflitti, self._alloca_id(len(conflitti), grafo.nodes)))
+
+        self.add_nodes([mappa.get(idn, idn) for idn in grafo.nodes])
+        for idn, nodo in grafo.nodes.items():
+            if nodo._labels:
+                self.add_nodes([mappa.get(idn, idn)], **nodo._labels)
+
+        righe, colonne, pesi, _ = grafo.adjacency_arrays()
+        if mappa:
+            chiavi = np.array(sorted(mappa), dtype=np.int64)
+            valori = np.array([mappa[idn] for idn in chiavi.tolist()], dtype=np.int64)
+            for estremi in (righe, colonne):
+                posizioni = np.minimum(np.searchsorted(chiavi, estremi), len(chiavi) - 1)
+                trovati = chiavi[posizioni] == estremi
+                estremi[trovati] = valori[posizioni[trovati]]
+        self.add_edges_bulk(righe, colonne, pesi)
+
+        for idn, nodo in grafo.nodes.items():
+            if nodo._extra is not None:
+                for vicino, extra in nodo._extra.items():
+                    self.update_edge_labels([(mappa.get(idn, idn), mappa.get(vicino, vicino))], **extra)
+        return mappa
 
 
     def save(self,**inputo):
@@ -437,13 +1448,24 @@ class DirectedGraph:
         verrà creata all'interno della cartella del programma e si
         chiamerà come il grafo. Se dovesse già esistere una o più
         cartelle con quel nome sarà chiamata Nome_grafo(1),Nome_grafo(2)...
-        i file saranno salvati con i nomi "adjacency.pkl", "id list.pkl",
-        "attributes.pkl", "edge labels.pkl"
+
+        Nel formato "npy" (predefinito) la struttura del grafo viene salvata come array
+        binari in forma CSR, un file .npy per ciascuno degli array di FrozenGraph
+        ("ids.npy", "indptr_out.npy", "indices_out.npy", "weights_out.npy", "indptr_in.npy",
+        "indices_in.npy", "weights_in.npy"), mentre le etichette sono salvate a parte in
+        "attributes.pkl" (nome, peso di default ed etichette dei soli nodi che ne hanno) e
+        "edge_labels.pkl" (etichette diverse dal peso dei soli archi che ne hanno).
+        Nel formato "pkl" i file saranno salvati con i nomi "adjacency.pkl", "id_list.pkl",
+        "attributes.pkl", "edge_labels.pkl"
+
+        Dopo il salvataggio il grafo resta associato alla nuova cartella e registra le
+        modifiche successive, da salvare con checkpoint() e compact().
 
         :param: **inputo:
                         percorso: il percorso in cui creare la cartella
                         nome: il nome della cartella
-        :return:
+                        formato: "npy" oppure "pkl". DEFAULT: "npy"
+        :return: il percorso della cartella creata
         """
         if "nome" not in list(inputo.keys()):
             nome=self.name
@@ -453,118 +1475,117 @@ class DirectedGraph:
             percorso=os.getcwd()
         else:
             percorso = inputo["percorso"]
-        cartella_programma=os.getcwd()
+        formato = inputo.get("formato", "npy")
+        base=nome
         i=0
-        while os.path.exists(percorso+"\\"+nome):
+        while os.path.exists(os.path.join(percorso, nome)):
             i = i + 1
-            nome = self.name + "(" + str(i) + ")"
-        percorso = percorso + "\\" + nome
+            nome = base + "(" + str(i) + ")"
+        percorso = os.path.join(percorso, nome)
         os.makedirs(percorso)
+        self._scrivi(percorso, formato)
+        self._cartella = percorso
+        self._registro = []
+        return percorso
+
+
+    def _scrivi(self, percorso, formato):
+        """
+        Scrive i file del grafo, nel formato indicato, nella cartella data (che deve esistere).
+
+        :param percorso: il percorso della cartella
+        :param formato: "npy" oppure "pkl"
+        :return:
+        """
+        if formato == "pkl":
+            with open(os.path.join(percorso, "id_list.pkl"),"wb") as file_id:
+                dump(list(self.nodes.keys()),file_id)
+            with open(os.path.join(percorso, "adjacency.pkl"),"wb") as file_matrice:
+                dump(dict(self.compute_adjacency("S")),file_matrice)
+            labels={}
+            for idn, nodo in self.nodes.items():
+                labels[idn]=dict(nodo.labels)
+        else:
+            self.freeze().save_arrays(percorso)
+            labels={}
+            for idn, nodo in self.nodes.items():
+                if nodo._labels:
+                    labels[idn]=nodo._labels
 
-        os.chdir(percorso)
-        file_id=open("id_list.pkl","wb")
-        dump(list(self.nodes.keys()),file_id)
-        #file_id.write(str(list(self.nodes.keys())))
-        file_id.close()
-        file_matrice=open("adjacency.pkl","wb")
-        dump(dict(self.compute_adjacency("S")),file_matrice)
-        #file_matrice.write(str(dict(self.compute_adjacency("S"))))
-        file_matrice.close()
-        labels={}
-        for idn in self.nodes.keys():
-            labels[idn]=self.nodes[idn].labels
         attributi={"name":self.name,"default_weight":self.default_weight,"node_labels":labels}
-        file_attributi=open("attributes.pkl","wb")
-        dump(attributi,file_attributi)
-        #file_attributi.write(str(attributi))
-        file_attributi.close()
+        with open(os.path.join(percorso, "attributes.pkl"),"wb") as file_attributi:
+            dump(attributi,file_attributi)
         archi={}
-        for arco in self.get_edges():
-            lista=[arco]
-            a=list(self.get_edges_labels(lista)[0].values())[0].copy()
-            del a["weight"]
-            archi[arco]=a.copy()
-        file_archi=open("edge_labels.pkl","wb")
-        dump(archi,file_archi)
-        #file_archi.write(str(archi))
-        file_archi.close()
-        
-        os.chdir(cartella_programma)
+        for nodo in self.nodes.values():
+            if formato == "pkl":
+                for idn in nodo._out:
+                    archi[(nodo.id, idn)] = {}
+            if nodo._extra is not None:
+                for idn, extra in nodo._extra.items():
+                    archi[(nodo.id, idn)] = extra
+        with open(os.path.join(percorso, "edge_labels.pkl"),"wb") as file_archi:
+            dump(archi,file_archi)
 
 
     def add_from_files(self,percorso):
         """
-        dato il percorso di una cartella, cerca al suo interno dei file
-        "adjacency.pkl", "id list.pkl", "attributes.pkl", "edge labels.pkl",
-        aggiunge tutti gli elementi di un altro grafo salvato su tali file
+        dato il percorso di una cartella creata con save, in uno qualsiasi dei due formati,
+        aggiunge tutti gli elementi del grafo salvato. Se il grafo e' vuoto i nodi mantengono
+        gli ID salvati, altrimenti ricevono nuovi ID liberi (nell'ordine degli ID salvati).
 
         :param: percorso: il percorso della cartella nella quale sono salvati i file
         :return:
         """
-        cartella_programma=os.getcwd()
-        os.chdir(percorso)
-        file_id=open("id_list.pkl","rb")
-        lista_id=load(file_id,allow_pickle=True)
-        file_id.close()
-        file_attributi=open("attributes.pkl","rb")
-        attributi=load(file_attributi,allow_pickle=True)
-        file_attributi.close()
-        file_matrice=open("adjacency.pkl","rb")
-        matrice=load(file_matrice,allow_pickle=True)
-        file_matrice.close()
-        file_archi=open("edge_labels.pkl","rb")
-        archi=load(file_archi,allow_pickle=True)
-        file_archi.close()
-        
-        
-            
-        self.auto_add_nodes(len(list(lista_id)))
-        
-        #lista=[]
-        #for i in list(lettura):
-        #    if i not in self.nodes.keys():
-        #        lista.append(i)
-        #self.add_nodes(lista)
-        #self.auto_add_nodes(len(list(lettura))-len(lista))
-
-        #add_nodes([idn],attributi[node_labels][idn])
-        i=0
-        for idn in lista_id:
-            i=i+1
-            self.nodes[list(self.nodes.keys())[-len(lista_id)+i-1]].labels.update(attributi["node_labels"][idn])
-        for arco in matrice.keys():
-            i=0
-            trovato=0
-            id_out=0
-            id_in=0
-            while trovato<2:
-                for i in range(len(lista_id)):
-                    idn=lista_id[i]
-                    if idn==arco[0]:
-                        id_out=i
-                        trovato=trovato+1
-                    if idn==arco[1]:
-                        id_in=i
-                        trovato=trovato+1
-                    
-            id_out=list(self.nodes.keys())[-len(lista_id)+id_out]
-            id_in=list(self.nodes.keys())[-len(lista_id)+id_in]
-            
-            nuovo_arco=(id_out,id_in)
-            self.add_edges([nuovo_arco],**archi[arco])
-            self.add_edges([nuovo_arco],weight=matrice[arco])
-
-        os.chdir(cartella_programma)
-
-    def plot(self,etichette_nodi=False,etichette_archi=False):
+        percorso = _cartella_base(percorso)
+        with open(os.path.join(percorso, "attributes.pkl"),"rb") as file_attributi:
+            attributi=load(file_attributi)
+        with open(os.path.join(percorso, "edge_labels.pkl"),"rb") as file_archi:
+            archi=load(file_archi)
+
+        if FrozenGraph.is_saved_in(percorso):
+            snapshot = FrozenGraph.load_arrays(percorso)
+            lista_id = snapshot.ids
+            righe = np.repeat(np.arange(len(lista_id)), snapshot.out_degrees())
+            colonne = snapshot.indices_out
+            pesi = snapshot.weights_out
+        else:
+            with open(os.path.join(percorso, "id_list.pkl"),"rb") as file_id:
+                lista_id=np.array(load(file_id), dtype=np.int64)
+            with open(os.path.join(percorso, "adjacency.pkl"),"rb") as file_matrice:
+                matrice=load(file_matrice)
+            posizione = {idn: i for i, idn in enumerate(lista_id.tolist())}
+            righe = np.fromiter((posizione[int(arco[0])] for arco in matrice), dtype=np.int64, count=len(matrice))
+            colonne = np.fromiter((posizione[int(arco[1])] for arco in matrice), dtype=np.int64, count=len(matrice))
+            pesi = np.fromiter(matrice.values(), dtype=float, count=len(matrice))
+
+        if self.nodes:
+            nuovi_id = np.array(self._alloca_id(len(lista_id)), dtype=np.int64)
+        else:
+            nuovi_id = np.asarray(lista_id, dtype=np.int64)
+        posizione = dict(zip(np.asarray(lista_id).tolist(), nuovi_id.tolist()))
+
+        self.add_nodes(nuovi_id.tolist())
+        for idn, labels in attributi["node_labels"].items():
+            if labels:
+                self.add_nodes([posizione[idn]], **labels)
+        self.add_edges_bulk(nuovi_id[righe], nuovi_id[colonne], pesi)
+        for arco, extra in archi.items():
+            if extra:
+                self.update_edge_labels([(posizione[arco[0]], posizione[arco[1]])], **extra)
+
+    def plot(self,etichette_nodi=False,etichette_archi=False,file=None,mostra_id=True):
         """
         il metodo genera un grafico del grafo. A discrezione dell’utente si
         può scegliere di visualizzare anche le etichette degli archi e/o dei nodi.
         il grafo viene visualizzato ponendo tutti i nodi su di una circonferenza.
         gli archi sono dunque visualizzati come corde di tale circonferenza. Gli
-        id dei nodi sono sempre visualizzati. eventualmente le etichette relative
+        id dei nodi sono visualizzati se mostra_id e' True. eventualmente le etichette relative
         agli archi sono visualizzate in un riquadro a destra del grafico
 
+        Le posizioni dei nodi vengono calcolate tutte insieme e conservate finche' l'insieme dei
+        nodi non cambia; tutti i nodi sono disegnati con un solo scatter e tutti gli archi con un
+        solo quiver, quindi il costo cresce linearmente con nodi e archi. Se file e' indicato la
+        figura viene salvata e chiusa senza aprire alcuna finestra (plt.show non viene chiamato).
 
         :param etichette_nodi: bool dove True = voglio vedere le etichette relative ai nodi
                                mentre False = non voglio vedere le etichette relative ai nodi
@@ -572,54 +1593,67 @@ class DirectedGraph:
         :param etichette_archi:bool dove True = voglio vedere le etichette relative ai archi
                                mentre False = non voglio vedere le etichette relative ai archi
                                DEFAULT:False
-        :return:
+        :param file: (facoltativo) percorso del file immagine in cui salvare il grafico. DEFAULT: None
+        :param mostra_id: bool, se False gli id dei nodi non vengono scritti. DEFAULT: True
+        :return: fig: la figura matplotlib generata
         
         """
-        ax = plt.subplot(121, projection='polar')
-        spaziatura=np.linspace(0.0, 2*np.pi,len(list(self.nodes.keys()))+1)
-        r=[]
-        volume = []
-        j=-1
-        for i in range(len(list(self.nodes.keys()))+1):
-            j=j+1
-            r.append(2)
-            volume.append(300)
-        for i in range(len(list(self.nodes.keys()))):
-            ax.text(spaziatura[i],2.1,str(list(self.nodes.keys())[i]))
-            if etichette_nodi==True:
-                ax.text(spaziatura[i],2.3,str(list(self.nodes.values())[i].labels))            
-        raggio_costante=np.array(r)
-        ax.scatter(spaziatura,raggio_costante,volume)
-
-        testo_archi=""
-        for arco in self.get_edges():
-            i=-1
-            for idn in list(self.nodes.keys()):
-                i=i+1
-                if idn==arco[0]:
-                    x1=spaziatura[i]
-                if idn==arco[1]:
-                    x2=spaziatura[i]
-            #ax.plot(np.array([x1,x2]),np.array([2,2]),linewidth=self.get_edges_labels([arco])[0][arco]["weight"],color='red')
-            #ax.arrow(x1,2,x2-x1,-0.2,head_width=0.1)
-            ax.annotate("", xy=(x2, 1.9), xytext=(x1, 2),arrowprops=dict(arrowstyle="->"))
-            testo_archi=testo_archi + "\n" + str(self.get_edges_labels([arco])[0])
-            
-        if etichette_archi==True:
-            ax.text(0, 4, testo_archi, style='italic',bbox={'facecolor': 'white', 'alpha': 0.5, 'pad': 10})
+        import matplotlib.pyplot as plt
+
+        ids, posizione, coordinate = self._disposizione()
+        fig = plt.figure()
+        ax = fig.add_subplot(121)
+        ax.scatter(coordinate[:, 0], coordinate[:, 1], 300 if len(ids) <= 100 else 10, zorder=2)
+        if mostra_id or etichette_nodi:
+            for i, idn in enumerate(ids):
+                x, y = 1.05 * coordinate[i]
+                ax.text(x, y, str(idn))
+                if etichette_nodi and self.nodes[idn]._labels:
+                    ax.text(1.15 * x, 1.15 * y, str(self.nodes[idn]._labels))
+
+        gradi = [len(nodo._out) for nodo in self.nodes.values()]
+        partenze = np.repeat(np.array([posizione[idn] for idn in self.nodes], dtype=np.int64), gradi)
+        arrivi = np.array([posizione[idn] for idn in chain.from_iterable(nodo._out for nodo in self.nodes.values())],
+                          dtype=np.int64)
+        if len(partenze):
+            origini = coordinate[partenze]
+            vettori = 0.9 * (coordinate[arrivi] - origini)
+            ax.quiver(origini[:, 0], origini[:, 1], vettori[:, 0], vettori[:, 1],
+                      angles="xy", scale_units="xy", scale=1, width=0.004,
+                      headwidth=6, headlength=8, zorder=1)
 
-        #ax.arrow(spaziatura[0],2,spaziatura[1]-spaziatura[0],-0.2,head_width=0.1,length_includes_head=True)
+        if etichette_archi==True:
+            testo_archi = "\n".join(str({(id_out, id_in): etichette}) for id_out, id_in, etichette in self.iter_edges())
+            ax.text(1.1, 1, testo_archi, transform=ax.transAxes, va="top", style='italic',
+                    bbox={'facecolor': 'white', 'alpha': 0.5, 'pad': 10})
+
+        ax.set_xlim(-2.5, 2.5)
+        ax.set_ylim(-2.5, 2.5)
+        ax.set_aspect("equal")
+        ax.set_axis_off()
+
+        if file is not None:
+            fig.savefig(file, bbox_inches="tight")
+            plt.close(fig)
+        else:
+            plt.show()
+        return fig
 
+    def _disposizione(self):
+        """
+        Restituisce la disposizione dei nodi sulla circonferenza di raggio 2 usata da plot,
+        calcolandola solo se l'insieme dei nodi e' cambiato dall'ultima volta.
 
-        
-        
-        
-        ax.set_rmax(2)
-        ax.set_rticks([])
-        ax.set_thetagrids(())
-        ax.grid(False)
-        
-        plt.show()
+        :return: ids: lista degli ID nell'ordine di self.nodes,
+                 posizione: dizionario id:indice in ids,
+                 coordinate: array (n, 2) delle coordinate cartesiane dei nodi
+        """
+        if self._layout is None:
+            ids = list(self.nodes)
+            angoli = np.linspace(0.0, 2 * np.pi, len(ids), endpoint=False)
+            coordinate = 2 * np.column_stack((np.cos(angoli), np.sin(angoli)))
+            self._layout = (ids, dict(zip(ids, range(len(ids)))), coordinate)
+        return self._layout
 
     def minpath_dijkstra(self,id_start,id_end):
         """
@@ -632,7 +1666,9 @@ class DirectedGraph:
         :param id_end: id del nodo di arrivo
         :return:(parenti, lista_pesi)
 
-        N.B. il valore infinito utilizzato da Dijkstra è stato devinito inf=99999999999
+        L'algoritmo usa una coda di priorita' (heapq) con cancellazione pigra delle voci
+        obsolete e termina non appena il nodo di arrivo viene estratto dalla coda; il
+        cammino e' ricostruito risalendo i predecessori a partire dal nodo di arrivo.
 
         Se vengono forniti id inesistenti si riceve un messaggio
         di errore "input invalidi" e il metodo restituisce None,None
@@ -645,63 +1681,272 @@ class DirectedGraph:
         if (id_start not in self.nodes.keys()) or (id_end not in self.nodes.keys()):
             print("input invalidi")
             return None, None
-        inf=99999999999
 
-        costo_nodi={}
-        parents={}
-        non_processati=list(self.nodes.keys())
+        costo_nodi, parents = self._dijkstra(id_start, id_end)
 
-        for nodo in self.nodes.keys():
-            costo_nodi[nodo]=inf
-            #parents[nodo]=None
-        costo_nodi[id_start]=0
-        
+        if id_end not in costo_nodi:
+            print("I nodi indicati non sono collegabili tra di loro")
+            return None,None
 
-        while non_processati != []:
-            nodo_minimo=id_start
-            temp_dict={}
-            for nodo in costo_nodi:
-                if nodo in non_processati:
-                    temp_dict[nodo]=costo_nodi[nodo]
-            for nodo in costo_nodi:
-                if costo_nodi[nodo] == min(list(temp_dict.values())):
-                    nodo_minimo=nodo
-            if costo_nodi[nodo_minimo]==inf:
-                print("I nodi indicati non sono collegabili tra di loro")
-                return None,None
-            
-            for vicino in self.nodes[nodo_minimo].neighbours_out:
-                temp =vicino[1]["weight"] + costo_nodi[nodo_minimo]
-                if temp<costo_nodi[vicino[0].id]:
-                    costo_nodi[vicino[0].id]=vicino[1]["weight"] + costo_nodi[nodo_minimo]
-                    parents[vicino[0].id]=nodo_minimo
-            non_processati.append(None)
-            for i in range(len(non_processati)-1):
-                if non_processati[i]==nodo_minimo:
-                    del non_processati[i]
-                    #del costo_nodi[nodo_minimo]
-            del non_processati[-1]
-            if id_end not in non_processati:
-                non_processati.clear()
-                
-        if id_end not in parents.keys():
-            parents[id_end]=id_end
-        #del parents[list(parents.keys())[0]]
-        parenti=list(parents.values())
-        for padre in parenti:
-            copiaparenti=parenti.copy()
-            copiaparenti.remove(padre)
-            if padre in copiaparenti:
-                parenti.remove(padre)
-        lista_pesi=[]
-        for i in range(len(parenti)-1):
-            nodo1=(parenti)[i]
-            nodo2=(parenti)[i+1]
-            peso_passo=self.get_edges_labels([(nodo1,nodo2)])[0][(nodo1,nodo2)]["weight"]
-            lista_pesi.append(peso_passo)
+        return self._cammino_da_predecessori(parents, id_end)
 
-        return tuple(parenti),tuple(lista_pesi)
 
+    def _dijkstra(self, id_start, id_end=None):
+        """
+        Nucleo dell'algoritmo di Dijkstra su coda di priorita' (heapq) con cancellazione pigra.
+        Se id_end e' dato la visita si ferma quando id_end viene estratto dalla coda.
 
+        :param id_start: id del nodo di partenza
+        :param id_end: (facoltativo) id del nodo di arrivo
+        :return: distanze, parents: dizionari id:costo e id:predecessore dei soli nodi processati
+        """
+        costo_nodi={id_start: 0}
+        parents={id_start: None}
+        distanze={}
+        coda=[(0, 0, id_start)]
+        contatore=1
+
+        while coda:
+            costo, _, nodo_minimo = heappop(coda)
+            if nodo_minimo in distanze:
+                continue
+            distanze[nodo_minimo] = costo
+            if nodo_minimo == id_end:
+                break
+            for idn, peso in self.nodes[nodo_minimo]._out.items():
+                temp = costo + peso
+                if idn not in distanze and temp < costo_nodi.get(idn, inf):
+                    costo_nodi[idn] = temp
+                    parents[idn] = nodo_minimo
+                    heappush(coda, (temp, contatore, idn))
+                    contatore = contatore + 1
+
+        for idn in list(parents):
+            if idn not in distanze:
+                del parents[idn]
+        return distanze, parents
+
+
+    def _dijkstra_bidirezionale(self, id_start, id_end):
+        """
+        Variante bidirezionale dell'algoritmo di Dijkstra: una visita parte da id_start lungo i lati
+        uscenti (neighbours_out), l'altra da id_end lungo i lati entranti (neighbours_in). Ad ogni passo
+        avanza la visita con la coda di costo minore e ci si ferma quando la somma dei due minimi
+        supera il costo del miglior cammino gia' trovato.
 
-    
+        :param id_start: id del nodo di partenza
+        :param id_end: id del nodo di arrivo
+        :return: parents: dizionario id:predecessore dei nodi del cammino minimo, oppure None
+                 se i nodi non sono collegabili
+        """
+        costo_nodi=({id_start: 0}, {id_end: 0})
+        parents=({id_start: None}, {id_end: None})
+        processati=(set(), set())
+        code=([(0, 0, id_start)], [(0, 0, id_end)])
+        contatore=1
+        migliore=inf if id_start != id_end else 0
+        incontro=id_start if id_start == id_end else None
+
+        while code[0] and code[1]:
+            if code[0][0][0] + code[1][0][0] >= migliore:
+                break
+            lato = 0 if code[0][0][0] <= code[1][0][0] else 1
+            altro = 1 - lato
+            costo, _, nodo_minimo = heappop(code[lato])
+            if nodo_minimo in processati[lato]:
+                continue
+            processati[lato].add(nodo_minimo)
+            nodo = self.nodes[nodo_minimo]
+            if lato == 0:
+                vicini = nodo._out.items()
+            else:
+                vicini = ((idn, self.nodes[idn]._out[nodo_minimo]) for idn in nodo._in)
+            for idn, peso in vicini:
+                temp = costo + peso
+                if temp < costo_nodi[lato].get(idn, inf):
+                    costo_nodi[lato][idn] = temp
+                    parents[lato][idn] = nodo_minimo
+                    heappush(code[lato], (temp, contatore, idn))
+                    contatore = contatore + 1
+                if idn in costo_nodi[altro]:
+                    totale = costo_nodi[lato][idn] + costo_nodi[altro][idn]
+                    if totale < migliore:
+                        migliore = totale
+                        incontro = idn
+
+        if incontro is None:
+            return None
+        cammino = {incontro: parents[0][incontro]}
+        idn = incontro
+        while parents[0][idn] is not None:
+            cammino[parents[0][idn]] = parents[0][parents[0][idn]]
+            idn = parents[0][idn]
+        idn = incontro
+        while parents[1][idn] is not None:
+            cammino[parents[1][idn]] = idn
+            idn = parents[1][idn]
+        return cammino
+
+
+    def _astar(self, id_start, id_end, euristica):
+        """
+        Variante A* dell'algoritmo di Dijkstra: la coda e' ordinata per costo + euristica(nodo, arrivo).
+        L'euristica deve essere consistente (non sovrastimare mai il costo di un lato) perche'
+        il cammino trovato sia minimo.
+
+        :param id_start: id del nodo di partenza
+        :param id_end: id del nodo di arrivo
+        :param euristica: funzione che ricevuti due DirGraphNode stima il costo del cammino tra essi
+        :return: distanze, parents: come _dijkstra
+        """
+        arrivo = self.nodes[id_end]
+        costo_nodi={id_start: 0}
+        parents={id_start: None}
+        distanze={}
+        coda=[(euristica(self.nodes[id_start], arrivo), 0, 0, id_start)]
+        contatore=1
+
+        while coda:
+            _, _, costo, nodo_minimo = heappop(coda)
+            if nodo_minimo in distanze:
+                continue
+            distanze[nodo_minimo] = costo
+            if nodo_minimo == id_end:
+                break
+            for idn, peso in self.nodes[nodo_minimo]._out.items():
+                temp = costo + peso
+                if idn not in distanze and temp < costo_nodi.get(idn, inf):
+                    costo_nodi[idn] = temp
+                    parents[idn] = nodo_minimo
+                    heappush(coda, (temp + euristica(self.nodes[idn], arrivo), contatore, temp, idn))
+                    contatore = contatore + 1
+
+        return distanze, parents
+
+
+    def shortest_path(self, id_start, id_end, modo="dijkstra", euristica=None):
+        """
+        Dati gli ID di due nodi, il metodo restituisce (se esiste) il cammino minimo nello
+        stesso formato di minpath_dijkstra, scegliendo l'algoritmo con il parametro modo.
+
+        :param id_start: id del nodo di partenza
+        :param id_end: id del nodo di arrivo
+        :param modo:
+                    dijkstra: Dijkstra con coda di priorita' (come minpath_dijkstra)
+                    bidirezionale: Dijkstra bidirezionale, la ricerca all'indietro usa neighbours_in
+                    astar: A*, richiede il parametro euristica
+                    DEFAULT: "dijkstra"
+        :param euristica: funzione euristica(nodo, nodo_arrivo) che riceve due DirGraphNode (ad esempio
+                          per leggerne le coordinate da labels) e restituisce una stima consistente
+                          del costo del cammino tra essi. DEFAULT: None
+        :return:(parenti, lista_pesi)
+
+        Se vengono forniti id inesistenti, un modo sconosciuto o il modo astar senza euristica
+        si riceve un messaggio di errore "input invalidi" e il metodo restituisce None,None
+
+        Se il cammino desiderato non esiste si riceve un messaggio di errore
+        "I nodi indicati non sono collegabili tra di loro" e il metodo restituisce None, None
+        """
+        if modo == "dijkstra":
+            return self.minpath_dijkstra(id_start, id_end)
+        if ((id_start not in self.nodes.keys()) or (id_end not in self.nodes.keys())
+                or modo not in ("bidirezionale", "astar")
+                or (modo == "astar" and euristica is None)):
+            print("input invalidi")
+            return None, None
+
+        if modo == "bidirezionale":
+            parents = self._dijkstra_bidirezionale(id_start, id_end)
+        else:
+            distanze, parents = self._astar(id_start, id_end, euristica)
+            if id_end not in distanze:
+                parents = None
+        if parents is None:
+            print("I nodi indicati non sono collegabili tra di loro")
+            return None,None
+
+        return self._cammino_da_predecessori(parents, id_end)
+
+
+    def shortest_path_tree(self, id_start):
+        """
+        Dato l'ID di un nodo, il metodo calcola con una sola esecuzione dell'algoritmo di Dijkstra
+        l'albero dei cammini minimi verso tutti i nodi raggiungibili. Un qualsiasi cammino
+        puo' poi essere estratto con path_from_tree in tempo proporzionale alla sua lunghezza.
+
+        :param id_start: id del nodo di partenza
+        :return: (distanze, predecessori): dizionari id:costo minimo e id:id del predecessore
+                 (None per il nodo di partenza), limitati ai nodi raggiungibili
+
+        Se viene fornito un id inesistente si riceve un messaggio
+        di errore "input invalidi" e il metodo restituisce None,None
+        """
+        if id_start not in self.nodes.keys():
+            print("input invalidi")
+            return None, None
+        return self._dijkstra(id_start)
+
+
+    def path_from_tree(self, predecessori, id_end):
+        """
+        Dato il dizionario dei predecessori restituito da shortest_path_tree, il metodo
+        restituisce il cammino minimo verso id_end nello stesso formato di minpath_dijkstra.
+
+        :param predecessori: dizionario id:id del predecessore
+        :param id_end: id del nodo di arrivo
+        :return: (parenti, lista_pesi), oppure None,None se id_end non e' raggiungibile
+        """
+        if id_end not in predecessori:
+            return None, None
+        return self._cammino_da_predecessori(predecessori, id_end)
+
+    def batch_shortest_paths(self, coppie, workers=None):
+        """
+        Dato un elenco di coppie (id_start, id_end), il metodo restituisce i cammini minimi di tutte
+        le coppie nello stesso formato di minpath_dijkstra e nello stesso ordine delle coppie.
+        Il calcolo avviene sull'istantanea prodotta da freeze(), condivisa con un pool di processi
+        (vedi FrozenGraph.batch_shortest_paths); le richieste con la stessa partenza sono risolte
+        con una sola visita.
+
+        :param coppie: lista di tuple (id_start, id_end) oppure array di forma (k, 2)
+        :param workers: numero di processi; None = numero di CPU, 1 = nessun processo aggiuntivo.
+                        DEFAULT: None
+        :return: lista di (parenti, lista_pesi); per gli ID inesistenti o i nodi non collegabili
+                 l'elemento e' (None, None)
+        """
+        return self.freeze().batch_shortest_paths(coppie, workers)
+
+    def all_pairs_shortest_paths(self, metodo="auto", file=None):
+        """
+        Il metodo restituisce la matrice delle distanze minime tra tutte le coppie di nodi, con
+        righe e colonne nell'ordine di compact_ids() e inf per le coppie non collegabili.
+        Il calcolo avviene sull'istantanea prodotta da freeze() con Floyd-Warshall vettorizzato
+        oppure con una visita di Dijkstra da ogni nodo, scelti in base alla densita' del grafo
+        (vedi FrozenGraph.all_pairs_shortest_paths). Pensato per grafi fino a circa 10^4 nodi.
+
+        :param metodo: "auto", "floyd" o "dijkstra". DEFAULT: "auto"
+        :param file: (facoltativo) percorso di un file .npy in cui scrivere la matrice, che viene
+                     restituita come array mappato in memoria. DEFAULT: None
+        :return: distanze: array (n, n)
+        """
+        return self.freeze().all_pairs_shortest_paths(metodo, file)
+
+
+    def _cammino_da_predecessori(self, parents, id_end):
+        """
+        Ricostruisce il cammino che termina in id_end risalendo il dizionario dei predecessori
+        (in cui il nodo di partenza ha predecessore None) e legge il peso di ogni passo.
+
+        :param parents: dizionario id:id del predecessore
+        :param id_end: id del nodo di arrivo
+        :return: (parenti, lista_pesi)
+        """
+        parenti=[id_end]
+        while parents[parenti[-1]] is not None:
+            parenti.append(parents[parenti[-1]])
+        parenti.reverse()
+        lista_pesi=[]
+        for i in range(len(parenti)-1):
+            lista_pesi.append(self.nodes[parenti[i]]._out[parenti[i+1]])
+
+        return tuple(parenti),tuple(lista_pesi)
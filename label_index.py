@@ -0,0 +1,137 @@
+"""
+Modulo contenente la classe LabelIndex, un indice secondario sui valori di una etichetta
+dei nodi o degli archi di un grafo orientato.
+Gli indici si creano con DirectedGraph.create_node_index e DirectedGraph.create_edge_index
+e vengono aggiornati dal grafo ad ogni modifica di nodi, archi ed etichette.
+"""
+
+
+from bisect import bisect_left, bisect_right, insort
+
+
+class LabelIndex:
+    """
+    La classe LabelIndex associa ad ogni valore di una etichetta l'insieme degli elementi
+    (ID di nodi oppure tuple (id_out, id_in) di archi) che hanno quell'etichetta con quel valore.
+    Le ricerche per uguaglianza costano tempo costante, quelle per intervallo tempo logaritmico
+    piu' il numero di elementi restituiti, grazie all'elenco ordinato dei valori distinti.
+
+    Al suo interno sono presenti i seguenti attributi:
+    - chiave -> stringa: nome dell'etichetta indicizzata
+    - _elementi -> dizionario: contiene la corrispondenza valore:insieme di elementi
+    - _ordinati -> lista: valori distinti in ordine crescente, oppure None se vanno ricalcolati
+      (ad esempio perche' i valori non sono confrontabili tra loro)
+
+    I valori non hashable (liste, dizionari) non vengono indicizzati.
+    """
+    def __init__(self, chiave):
+        """
+        Questo metodo serve per l'inizializzazione di un indice vuoto.
+
+        :param chiave: nome dell'etichetta da indicizzare
+        :return:
+        """
+        self.chiave = chiave
+        self._elementi = {}
+        self._ordinati = []
+
+    def aggiungi(self, valore, elemento):
+        """
+        Registra che elemento ha l'etichetta indicizzata uguale a valore.
+
+        :param valore: valore dell'etichetta
+        :param elemento: ID del nodo o tupla (id_out, id_in) dell'arco
+        :return:
+        """
+        try:
+            insieme = self._elementi.get(valore)
+        except TypeError:
+            return
+        if insieme is None:
+            self._elementi[valore] = {elemento}
+            if self._ordinati is not None:
+                try:
+                    insort(self._ordinati, valore)
+                except TypeError:
+                    self._ordinati = None
+        else:
+            insieme.add(elemento)
+
+    def rimuovi(self, valore, elemento):
+        """
+        Cancella, se presente, l'associazione tra valore ed elemento.
+
+        :param valore: valore dell'etichetta
+        :param elemento: ID del nodo o tupla (id_out, id_in) dell'arco
+        :return:
+        """
+        try:
+            insieme = self._elementi.get(valore)
+        except TypeError:
+            return
+        if insieme is None:
+            return
+        insieme.discard(elemento)
+        if not insieme:
+            del self._elementi[valore]
+            if self._ordinati is not None:
+                posizione = bisect_left(self._ordinati, valore)
+                del self._ordinati[posizione]
+
+    def uguale(self, valore):
+        """
+        Restituisce gli elementi la cui etichetta e' uguale a valore.
+
+        :param valore: valore cercato
+        :return: lista di elementi
+        """
+        return list(self._elementi.get(valore, ()))
+
+    def intervallo(self, minimo=None, massimo=None):
+        """
+        Restituisce gli elementi la cui etichetta e' compresa tra minimo e massimo, estremi inclusi.
+        Un estremo pari a None non pone limiti da quel lato.
+
+        :param minimo: (facoltativo) valore minimo. DEFAULT: None
+        :param massimo: (facoltativo) valore massimo. DEFAULT: None
+        :return: lista di elementi, ordinati per valore crescente dell'etichetta
+        """
+        if self._ordinati is None:
+            try:
+                self._ordinati = sorted(self._elementi)
+            except TypeError:
+                return self._scansione(minimo, massimo)
+        try:
+            inizio = 0 if minimo is None else bisect_left(self._ordinati, minimo)
+            fine = len(self._ordinati) if massimo is None else bisect_right(self._ordinati, massimo)
+        except TypeError:
+            return self._scansione(minimo, massimo)
+        elementi = []
+        for valore in self._ordinati[inizio:fine]:
+            elementi.extend(self._elementi[valore])
+        return elementi
+
+    def _scansione(self, minimo, massimo):
+        """
+        Ricerca per intervallo sui soli valori confrontabili con gli estremi, usata quando i valori
+        indicizzati non si possono ordinare tra loro.
+        """
+        elementi = []
+        for valore, insieme in self._elementi.items():
+            try:
+                if (minimo is None or valore >= minimo) and (massimo is None or valore <= massimo):
+                    elementi.extend(insieme)
+            except TypeError:
+                pass
+        return elementi
+
+    def copia(self):
+        """
+        Restituisce un nuovo indice con gli stessi contenuti, indipendente da quello corrente.
+
+        :return: LabelIndex
+        """
+        copia = LabelIndex(self.chiave)
+        copia._elementi = {valore: set(insieme) for valore, insieme in self._elementi.items()}
+        copia._ordinati = None if self._ordinati is None else list(self._ordinati)
+        return copia
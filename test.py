@@ -4,7 +4,7 @@ abbiamo scritto questo file per mostrare il corretto funzionamento del modulo e
 
 from graphs import *
 from functions import *
-import os, shutil
+import os, shutil, io
 
 g=DirectedGraph("Grafo_1")#creazione di un grafo vuoto di nome "Grafo_1" 
 g.auto_add_nodes(12) #aggiunta di 12 nodi
@@ -44,4 +44,46 @@ grafone=load_graph(percorso) #creazione di un grafo come copia del grafo già pr
 
 print("\n\nStampa del cammino minimo e del costo di ogni passo")
 print(g.minpath_dijkstra(14,5)) #stampa del cammino minimo secondo dijkstra
+
+prova=DirectedGraph("Grafo_id")#controllo dell'assegnazione automatica degli ID
+prova.auto_add_nodes(10)
+prova.rmv_nodes([3])
+prova.add_nodes([3])
+prova.rmv_nodes([3]) #l'ID 3 viene liberato due volte
+nuovi=prova.auto_add_nodes(2)
+print("\n\nID assegnati dopo la doppia rimozione del nodo 3")
+print(nuovi) #[3, 10]
+assert nuovi==[3,10] and prova.size()[0]==11
+prova.rmv_nodes(prova.compact_ids()[[2,4]]) #ID di tipo numpy restituiti da compact_ids
+nuovi=prova.auto_add_nodes(2)
+print(nuovi) #[2, 4]
+assert nuovi==[2,4] and all(type(idn) is int for idn in nuovi)
+
+registro=DirectedGraph("Grafo_registro")#controllo del registro delle modifiche (delta.log)
+registro.add_edges([(0,1),(1,2)])
+cartella=registro.save()
+try:
+    registro.add_edges([(0,[2])]) #operazione non valida: solleva un'eccezione
+except TypeError:
+    pass
+registro.rmv_edges([(0,99)]) #arco inesistente: viene ignorato
+registro.rmv_edges([(1,2)])
+registro.checkpoint()
+ricaricato=load_graph(cartella) #ripete le sole operazioni riuscite
+print("\n\nArchi del grafo ricaricato dal registro")
+print(ricaricato.get_edges()) #[(0, 1)]
+assert ricaricato.get_edges()==registro.get_edges()
+
+flusso=DirectedGraph("Grafo_flusso")#controllo di esportazione e importazione degli archi
+flusso.add_edges([(0,1),(1,2)],weight=2.5,lunghezza=10,colore="rosso")
+for formato, tipi in (("csv", {"lunghezza": int}), ("tsv", {"lunghezza": int}), ("jsonl", None)):
+    testo=io.StringIO()
+    flusso.export_edges(testo, formato)
+    testo.seek(0)
+    importato=DirectedGraph("Grafo_importato")
+    importato.add_edges_from_stream(testo, formato, tipi=tipi)
+    print("\n\nEtichette degli archi importati dal formato "+formato)
+    print(importato.get_edges_labels([(0,1)])) #[{(0, 1): {'lunghezza': 10, 'colore': 'rosso', 'weight': 2.5}}]
+    assert importato.get_edges_labels(importato.get_edges())==flusso.get_edges_labels(flusso.get_edges())
+
 g.plot(False,True)#plot del grafo "Grafo_1"
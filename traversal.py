@@ -0,0 +1,242 @@
+"""
+Qui sono contenute le funzioni di visita di un grafo orientato: visita in ampiezza (bfs) e in
+profondita' (dfs), raggiungibilita' tra due nodi (is_reachable) e componenti fortemente e
+debolmente connesse. Tutte le funzioni sono iterative, quindi non risentono del limite di
+ricorsione di Python sui grafi profondi, e impiegano tempo lineare nel numero di nodi e archi
+visitati. Accettano sia un DirectedGraph sia un FrozenGraph.
+"""
+
+from collections import deque
+from itertools import chain
+
+
+def _vicini(grafo, direzione):
+    """
+    Restituisce la funzione che, dato l'ID di un nodo, produce gli ID dei suoi vicini nella
+    direzione indicata, oppure None se la direzione non esiste.
+
+    :param grafo: DirectedGraph o FrozenGraph
+    :param direzione: "out" (lati uscenti), "in" (lati entranti) o "entrambe"
+    :return: funzione id -> iterabile di ID
+    """
+    if hasattr(grafo, "nodes"):
+        nodi = grafo.nodes
+        if direzione == "out":
+            return lambda idn: nodi[idn]._out
+        if direzione == "in":
+            return lambda idn: nodi[idn]._in
+        if direzione == "entrambe":
+            return lambda idn: chain(nodi[idn]._out, nodi[idn]._in)
+        return None
+    if direzione == "out":
+        return lambda idn: grafo.neighbours_out(idn)[0].tolist()
+    if direzione == "in":
+        return lambda idn: grafo.neighbours_in(idn)[0].tolist()
+    if direzione == "entrambe":
+        return lambda idn: grafo.neighbours_out(idn)[0].tolist() + grafo.neighbours_in(idn)[0].tolist()
+    return None
+
+
+def _id_nodi(grafo):
+    """
+    Restituisce la lista degli ID dei nodi del grafo.
+    """
+    if hasattr(grafo, "nodes"):
+        return list(grafo.nodes)
+    return grafo.ids.tolist()
+
+
+def _esiste(grafo, idn):
+    """
+    Indica se il grafo contiene il nodo con ID idn.
+    """
+    if hasattr(grafo, "nodes"):
+        return idn in grafo.nodes
+    return grafo.index_of(idn) != -1
+
+
+def bfs(grafo, id_start, direzione="out"):
+    """
+    Questa funzione visita in ampiezza il grafo a partire dal nodo id_start e produce gli ID dei
+    nodi raggiunti, ognuno una sola volta, nell'ordine di visita (prima il nodo di partenza).
+
+    :param grafo: DirectedGraph o FrozenGraph
+    :param id_start: id del nodo di partenza
+    :param direzione: "out" per seguire i lati uscenti, "in" per quelli entranti, "entrambe" per
+                      ignorare il verso dei lati. DEFAULT: "out"
+    :return: generatore di ID
+
+    Se vengono forniti un id o una direzione inesistenti si riceve un messaggio
+    di errore "input invalidi" e il generatore non produce alcun nodo
+    """
+    vicini = _vicini(grafo, direzione)
+    if vicini is None or not _esiste(grafo, id_start):
+        print("input invalidi")
+        return
+    visitati = {id_start}
+    coda = deque([id_start])
+    while coda:
+        v = coda.popleft()
+        yield v
+        for u in vicini(v):
+            if u not in visitati:
+                visitati.add(u)
+                coda.append(u)
+
+
+def dfs(grafo, id_start, direzione="out"):
+    """
+    Questa funzione visita in profondita' il grafo a partire dal nodo id_start e produce gli ID
+    dei nodi nell'ordine in cui vengono scoperti (preordine). Al posto della ricorsione usa una
+    pila di iteratori sui vicini, quindi la profondita' del grafo non e' limitata.
+
+    :param grafo: DirectedGraph o FrozenGraph
+    :param id_start: id del nodo di partenza
+    :param direzione: "out", "in" o "entrambe", come in bfs. DEFAULT: "out"
+    :return: generatore di ID
+
+    Se vengono forniti un id o una direzione inesistenti si riceve un messaggio
+    di errore "input invalidi" e il generatore non produce alcun nodo
+    """
+    vicini = _vicini(grafo, direzione)
+    if vicini is None or not _esiste(grafo, id_start):
+        print("input invalidi")
+        return
+    visitati = {id_start}
+    yield id_start
+    pila = [iter(vicini(id_start))]
+    while pila:
+        for u in pila[-1]:
+            if u not in visitati:
+                visitati.add(u)
+                yield u
+                pila.append(iter(vicini(u)))
+                break
+        else:
+            pila.pop()
+
+
+def is_reachable(grafo, id_start, id_end):
+    """
+    Questa funzione indica se esiste un cammino orientato da id_start a id_end. La ricerca
+    procede in ampiezza contemporaneamente in avanti da id_start, lungo i lati uscenti, e
+    all'indietro da id_end, lungo i lati entranti, espandendo ogni volta la frontiera piu'
+    piccola, e si ferma appena le due visite si incontrano.
+
+    :param grafo: DirectedGraph o FrozenGraph
+    :param id_start: id del nodo di partenza
+    :param id_end: id del nodo di arrivo
+    :return: bool
+
+    Se vengono forniti id inesistenti si riceve un messaggio
+    di errore "input invalidi" e la funzione restituisce None
+    """
+    if not _esiste(grafo, id_start) or not _esiste(grafo, id_end):
+        print("input invalidi")
+        return None
+    if id_start == id_end:
+        return True
+    avanti, indietro = _vicini(grafo, "out"), _vicini(grafo, "in")
+    visti_avanti, visti_indietro = {id_start}, {id_end}
+    frontiera_avanti, frontiera_indietro = [id_start], [id_end]
+    while frontiera_avanti and frontiera_indietro:
+        if len(frontiera_avanti) <= len(frontiera_indietro):
+            frontiera, vicini, visti, altri = frontiera_avanti, avanti, visti_avanti, visti_indietro
+        else:
+            frontiera, vicini, visti, altri = frontiera_indietro, indietro, visti_indietro, visti_avanti
+        nuova = []
+        for v in frontiera:
+            for u in vicini(v):
+                if u in altri:
+                    return True
+                if u not in visti:
+                    visti.add(u)
+                    nuova.append(u)
+        if frontiera is frontiera_avanti:
+            frontiera_avanti = nuova
+        else:
+            frontiera_indietro = nuova
+    return False
+
+
+def strongly_connected_components(grafo):
+    """
+    Questa funzione restituisce le componenti fortemente connesse del grafo, calcolate con
+    l'algoritmo di Tarjan in forma iterativa (una pila di iteratori sui vicini al posto della
+    ricorsione). Le componenti sono elencate in ordine topologico inverso: nessun arco va da una
+    componente verso una che la segue nell'elenco.
+
+    :param grafo: DirectedGraph o FrozenGraph
+    :return: lista di liste di ID
+    """
+    vicini = _vicini(grafo, "out")
+    indice = {}
+    minimo = {}
+    pila = []
+    in_pila = set()
+    componenti = []
+    contatore = 0
+    for s in _id_nodi(grafo):
+        if s in indice:
+            continue
+        indice[s] = minimo[s] = contatore
+        contatore = contatore + 1
+        pila.append(s)
+        in_pila.add(s)
+        lavoro = [(s, iter(vicini(s)))]
+        while lavoro:
+            v, successori = lavoro[-1]
+            for w in successori:
+                if w not in indice:
+                    indice[w] = minimo[w] = contatore
+                    contatore = contatore + 1
+                    pila.append(w)
+                    in_pila.add(w)
+                    lavoro.append((w, iter(vicini(w))))
+                    break
+                if w in in_pila and indice[w] < minimo[v]:
+                    minimo[v] = indice[w]
+            else:
+                lavoro.pop()
+                if lavoro:
+                    u = lavoro[-1][0]
+                    if minimo[v] < minimo[u]:
+                        minimo[u] = minimo[v]
+                if minimo[v] == indice[v]:
+                    componente = []
+                    while True:
+                        w = pila.pop()
+                        in_pila.discard(w)
+                        componente.append(w)
+                        if w == v:
+                            break
+                    componenti.append(componente)
+    return componenti
+
+
+def weakly_connected_components(grafo):
+    """
+    Questa funzione restituisce le componenti debolmente connesse del grafo, cioe' le componenti
+    connesse ottenute ignorando il verso dei lati, con una visita in ampiezza per componente.
+
+    :param grafo: DirectedGraph o FrozenGraph
+    :return: lista di liste di ID
+    """
+    vicini = _vicini(grafo, "entrambe")
+    visitati = set()
+    componenti = []
+    for s in _id_nodi(grafo):
+        if s in visitati:
+            continue
+        visitati.add(s)
+        componente = [s]
+        coda = deque([s])
+        while coda:
+            v = coda.popleft()
+            for u in vicini(v):
+                if u not in visitati:
+                    visitati.add(u)
+                    componente.append(u)
+                    coda.append(u)
+        componenti.append(componente)
+    return componenti